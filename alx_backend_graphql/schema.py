@@ -1,4 +1,7 @@
 import graphene
+from graphql import specified_directives
+
+from crm.incremental import DeferDirective, StreamDirective
 from crm.schema import Query as CRMQuery, Mutation as CRMMutation
 
 class Query(CRMQuery, graphene.ObjectType):
@@ -7,4 +10,8 @@ class Query(CRMQuery, graphene.ObjectType):
 class Mutation(CRMMutation, graphene.ObjectType):
     pass
 
-schema = graphene.Schema(query=Query, mutation=Mutation)
+schema = graphene.Schema(
+    query=Query,
+    mutation=Mutation,
+    directives=(*specified_directives, DeferDirective, StreamDirective),
+)
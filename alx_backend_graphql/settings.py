@@ -128,4 +128,43 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 GRAPHENE = {
     "SCHEMA": "alx_backend_graphql.schema.schema"
-}
\ No newline at end of file
+}
+
+# CRM GraphQL endpoint tuning
+
+# Automatic persisted queries kept in memory per process (LRU)
+CRM_PERSISTED_QUERY_MAX_ENTRIES = 5000
+
+# Parsed and validated documents kept in memory per process (LRU)
+CRM_DOCUMENT_CACHE_MAX_ENTRIES = 1000
+
+# Upper bound on the statically estimated objects an operation may touch
+# (see crm/cost.py); None disables the check
+CRM_QUERY_COST_BUDGET = 50000
+
+# Assumed sizes of unpaginated list fields for the cost check, e.g.
+# {"Query.orders": 10000}; root model lists default to the table's row count
+# and relation lists to their average rows per parent
+CRM_QUERY_LIST_SIZES = {}
+
+# Opt-in cache of query responses invalidated by model writes,
+# e.g. {"ALIAS": "default", "TIMEOUT": 60}
+CRM_RESPONSE_CACHE = None
+
+# Cache holding totalCount values for connections using the "cached" count
+# strategy (allOrders). With several workers it must be shared between them
+# (database, file, Redis, ...): with per-process LocMem a write in one worker
+# leaves the others' counts stale for up to 5 minutes
+CRM_COUNT_CACHE_ALIAS = "default"
+
+# Maximum operations accepted in one batched (JSON array) POST to /graphql
+CRM_MAX_BATCH_SIZE = 20
+
+# Rows fetched per database round trip by the /export/<resource> views
+CRM_EXPORT_CHUNK_SIZE = 2000
+
+# Rows per IN lookup / bulk INSERT in the bulk mutations (see crm/bulk.py)
+CRM_BULK_CHUNK_SIZE = 1000
+
+# Response JSON encoder: "auto" (orjson if installed), "orjson" or "json"
+CRM_JSON_ENCODER = "auto"
@@ -19,10 +19,13 @@ from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 from .schema import schema
 
-from graphene_django.views import GraphQLView
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView, ExportView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("graphql", csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+    path("graphql", csrf_exempt(CRMGraphQLView.as_view(graphiql=True, schema=schema))),
+    # Async execution for ASGI servers (see alx_backend_graphql/asgi.py)
+    path("graphql/async", csrf_exempt(AsyncCRMGraphQLView.as_view(schema=schema))),
+    path("export/<str:resource>", ExportView.as_view(), name="crm-export"),
 ]
 
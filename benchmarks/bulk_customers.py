@@ -0,0 +1,96 @@
+"""
+bulkCreateCustomers throughput, set-based vs the old row-at-a-time loop.
+
+    python benchmarks/bulk_customers.py [--sizes 1000 10000 100000] [--legacy-max 10000]
+
+Each payload has 5% duplicate emails (half within the batch, half already
+stored) and 5% invalid rows. Runs use a throwaway test database.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+
+from crm.bulk import bulk_create_customers, clean_customer  # noqa: E402
+from crm.models import Customer  # noqa: E402
+
+
+def legacy_bulk_create(rows):
+    # The previous BulkCreateCustomers.mutate: exists() + INSERT per row.
+    created, errors = [], []
+    with transaction.atomic():
+        for data in rows:
+            try:
+                cleaned = clean_customer(data)
+                if Customer.objects.filter(email=cleaned["email"]).exists():
+                    raise ValueError(f"Duplicate email: {cleaned['email']}")
+                created.append(Customer.objects.create(**cleaned))
+            except Exception as e:
+                errors.append(str(e))
+    return created, errors
+
+
+def payload(n, run):
+    rows = []
+    for i in range(n):
+        if i % 40 == 1:
+            rows.append({"name": f"Dup {i}", "email": f"r{run}-{i - 1}@example.com"})
+        elif i % 40 == 2:
+            rows.append({"name": f"Seeded {i}", "email": "seeded@example.com"})
+        elif i % 20 == 3:
+            rows.append({"name": f"Bad {i}", "email": f"r{run}-{i}@example.com", "phone": "12"})
+        else:
+            rows.append({"name": f"Customer {i}", "email": f"r{run}-{i}@example.com",
+                         "phone": f"+1 555-{i % 1000:03d}-{i % 10000:04d}"})
+    return rows
+
+
+def measure(fn, rows):
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        created, errors = fn(rows)
+        seconds = time.perf_counter() - start
+    return len(created), len(errors), queries, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="skip the row-at-a-time loop above this many rows")
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        Customer.objects.create(name="Seeded", email="seeded@example.com")
+        print(f"{'rows':>7}  {'implementation':<14} {'created':>7} {'errors':>6} {'queries':>7} {'seconds':>8} {'rows/s':>9}")
+        for run, n in enumerate(args.sizes):
+            variants = [("set-based", bulk_create_customers)]
+            if n <= args.legacy_max:
+                variants.insert(0, ("row-at-a-time", legacy_bulk_create))
+            for label, fn in variants:
+                rows = payload(n, f"{run}{label[0]}")
+                created, errors, queries, seconds = measure(fn, rows)
+                print(f"{n:>7}  {label:<14} {created:>7} {errors:>6} {queries:>7} {seconds:>8.2f} {n / seconds:>9.0f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Encode time for a 10k-order GraphQL response with each available encoder.
+
+    python benchmarks/encode_responses.py [--orders 10000] [--repeat 20]
+
+The payload mirrors `{ orders { id totalAmount orderDate customer { name email }
+products { edges { node { name price } } } } }`. Decimal/datetime values are
+left unserialized in a second variant to exercise the encoders' default hook.
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from graphene_django.views import GraphQLView  # noqa: E402
+
+from crm.encoders import ENCODERS  # noqa: E402
+
+
+def build_response(n_orders, serialized=True):
+    now = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    orders = []
+    for i in range(n_orders):
+        total = Decimal(i % 500) + Decimal("0.99")
+        date = now + datetime.timedelta(minutes=i)
+        orders.append({
+            "id": f"T3JkZXJUeXBlOj{i}",
+            "totalAmount": str(total) if serialized else total,
+            "orderDate": date.isoformat() if serialized else date,
+            "customer": {"name": f"Customer {i % 100}", "email": f"c{i % 100}@example.com"},
+            "products": {"edges": [
+                {"node": {"name": f"Product {j}", "price": "9.99" if serialized else Decimal("9.99")}}
+                for j in range(3)
+            ]},
+        })
+    return {"data": {"orders": orders}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    class Request:
+        GET = {}
+
+    view = GraphQLView()
+    candidates = {"graphene-django (json.dumps)": lambda d: view.json_encode(Request, d)}
+    candidates.update(ENCODERS)
+
+    for label, serialized in (("graphene-serialized scalars", True), ("raw Decimal/datetime", False)):
+        payload = build_response(args.orders, serialized)
+        print(f"{args.orders} orders, {label}:")
+        for name, encode in candidates.items():
+            try:
+                encode(payload)
+            except TypeError:
+                print(f"  {name:32} n/a (no Decimal/datetime support)")
+                continue
+            seconds = min(timeit.repeat(lambda: encode(payload), number=1, repeat=args.repeat))
+            print(f"  {name:32} {seconds * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Plans and timings for OrderFilter's relational filters against the plain
+join they replaced and a correlated EXISTS, on a generated order-product table.
+
+    python benchmarks/order_filters.py [--orders 200000] [--per-order 5] [--repeat 5]
+
+The defaults give 1M order-product rows. Data goes into a throwaway test
+database; the configured database is not touched.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Exists, OuterRef  # noqa: E402
+
+from crm.filters import OrderFilter  # noqa: E402
+from crm.models import Customer, Order, OrderItem, Product  # noqa: E402
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+def seed(n_orders, per_order, n_customers, n_products):
+    rng = random.Random(0)
+    now = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    through = OrderItem._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {Customer._meta.db_table} (id, name, email, created_at) VALUES (%s, %s, %s, %s)",
+            [(i, f"Customer {i} {rng.choice(WORDS)}", f"c{i}@example.com", now) for i in range(1, n_customers + 1)],
+        )
+        cursor.executemany(
+            f"INSERT INTO {Product._meta.db_table} (id, name, price, stock) VALUES (%s, %s, %s, %s)",
+            [(i, f"Product {i} {rng.choice(WORDS)}", "9.99", 100) for i in range(1, n_products + 1)],
+        )
+        cursor.executemany(
+            f"INSERT INTO {Order._meta.db_table} (id, customer_id, total_amount, order_date) VALUES (%s, %s, %s, %s)",
+            [
+                (i, rng.randint(1, n_customers), "0", now + datetime.timedelta(seconds=i))
+                for i in range(1, n_orders + 1)
+            ],
+        )
+        cursor.executemany(
+            f"INSERT INTO {through} (order_id, product_id, quantity, unit_price) VALUES (%s, %s, 1, '9.99')",
+            [
+                (order_id, product_id)
+                for order_id in range(1, n_orders + 1)
+                for product_id in rng.sample(range(1, n_products + 1), per_order)
+            ],
+        )
+        cursor.execute("ANALYZE")
+
+
+def plan(queryset):
+    return "\n".join("    " + line for line in queryset.explain().splitlines())
+
+
+def run(queryset, page_size=20):
+    # What a connection page costs: the count plus the first page.
+    queryset.count()
+    list(queryset.order_by("order_date", "id").values_list("pk", flat=True)[:page_size])
+
+
+def best_of(repeat, queryset):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(queryset)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--per-order", type=int, default=5)
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        start = time.perf_counter()
+        seed(args.orders, args.per_order, args.customers, args.products)
+        print(f"seeded {args.orders * args.per_order} order-product rows "
+              f"in {time.perf_counter() - start:.1f}s\n")
+
+        orders = Order.objects.all()
+        through = OrderItem.objects
+        cases = [
+            ("product_id", 42, {
+                "join": orders.filter(products__id=42).distinct(),
+                "exists": orders.filter(Exists(through.filter(order_id=OuterRef("pk"), product_id=42))),
+            }),
+            ("product_name", "oduct 12", {
+                "join": orders.filter(products__name__icontains="oduct 12").distinct(),
+                "exists": orders.filter(Exists(through.filter(
+                    order_id=OuterRef("pk"), product__name__icontains="oduct 12"
+                ))),
+            }),
+            ("customer_name", "tomer 77", {
+                "join": orders.filter(customer__name__icontains="tomer 77"),
+            }),
+        ]
+        for name, value, variants in cases:
+            variants["OrderFilter"] = OrderFilter({name: value}, queryset=orders).qs
+            print(f"{name}={value!r}")
+            for label, queryset in variants.items():
+                rows = queryset.count()
+                seconds = best_of(args.repeat, queryset)
+                print(f"  {label:<12} {rows:>7} rows  {seconds * 1000:9.1f} ms")
+                print(plan(queryset))
+            print()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
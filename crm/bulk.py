@@ -0,0 +1,297 @@
+"""
+Set-based helpers for the bulk mutations: rows are validated in memory,
+checked against the database with one IN query per chunk and inserted
+with chunked bulk_create().
+"""
+import re
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import Customer, Order, OrderItem, Product
+from .signals import bump_generation
+
+PHONE_RE = re.compile(r'^\+?\d[\d\-\s]{7,}$')
+
+
+def chunk_size():
+    return getattr(settings, "CRM_BULK_CHUNK_SIZE", 1000)
+
+
+def chunked(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def existing_values(model, field_name, values, size=None):
+    """The subset of `values` already stored in `model.<field_name>`."""
+    found = set()
+    for chunk in chunked(values, size or chunk_size()):
+        found.update(
+            model.objects.filter(**{f"{field_name}__in": chunk}).values_list(field_name, flat=True)
+        )
+    return found
+
+
+def _check_strings(data, fields):
+    # Rows from files aren't typed by the schema like mutation input is.
+    for field in fields:
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"{field.capitalize()} must be a string")
+
+
+def clean_customer(data):
+    """Validate one customer row with CreateCustomer's rules; raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Expected an object with name, email and phone")
+    _check_strings(data, ("name", "email", "phone"))
+    name = data.get("name")
+    email = data.get("email")
+    phone = data.get("phone") or None
+    if not name or not email:
+        raise ValueError("Name and email are required")
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ValueError(f"Invalid email: {email}")
+    if phone and not PHONE_RE.match(phone):
+        raise ValueError(f"Invalid phone number: {phone}")
+    return {"name": name, "email": email, "phone": phone}
+
+
+def clean_product(data):
+    """Validate one product row with CreateProduct's rules; raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Expected an object with name, price and stock")
+    _check_strings(data, ("name",))
+    name = data.get("name")
+    if not name:
+        raise ValueError("Name is required")
+    try:
+        price = Decimal(str(data.get("price")))
+    except InvalidOperation:
+        raise ValueError(f"Invalid price: {data.get('price')}")
+    if not price.is_finite() or price <= 0:
+        raise ValueError("Price must be positive")
+    stock = data.get("stock")
+    stock = 0 if stock in (None, "") else stock
+    try:
+        stock = int(stock)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid stock: {stock}")
+    if stock < 0:
+        raise ValueError("Stock cannot be negative")
+    return {"name": name, "price": price.quantize(Decimal("0.01")), "stock": stock}
+
+
+def bulk_create_customers(rows, size=None):
+    """
+    Insert every valid row of `rows` that doesn't reuse an email.
+
+    Returns (created customers, [(row index, message), ...]). The first row
+    with a given email wins; later ones and emails already stored are errors.
+    """
+    size = size or chunk_size()
+    errors, candidates, seen = [], [], set()
+    for index, data in enumerate(rows):
+        try:
+            cleaned = clean_customer(data)
+        except ValueError as e:
+            errors.append((index, str(e)))
+            continue
+        if cleaned["email"] in seen:
+            errors.append((index, f"Duplicate email: {cleaned['email']}"))
+            continue
+        seen.add(cleaned["email"])
+        candidates.append((index, Customer(**cleaned)))
+
+    taken = existing_values(Customer, "email", seen, size)
+    survivors = []
+    for index, customer in candidates:
+        if customer.email in taken:
+            errors.append((index, f"Duplicate email: {customer.email}"))
+        else:
+            survivors.append((index, customer))
+
+    created = []
+    with transaction.atomic():
+        for chunk in chunked(survivors, size):
+            created.extend(_insert_customers(chunk, errors))
+    if created:
+        # bulk_create() sends no post_save
+        bump_generation(Customer)
+    errors.sort()
+    return created, errors
+
+
+def _insert_customers(chunk, errors):
+    try:
+        with transaction.atomic():
+            return Customer.objects.bulk_create([customer for _, customer in chunk])
+    except IntegrityError:
+        # Another writer stored some of these emails after the lookup.
+        taken = existing_values(Customer, "email", [customer.email for _, customer in chunk])
+        rest = []
+        for index, customer in chunk:
+            if customer.email in taken:
+                errors.append((index, f"Duplicate email: {customer.email}"))
+            else:
+                rest.append(customer)
+        with transaction.atomic():
+            return Customer.objects.bulk_create(rest)
+
+
+def upsert_customers(rows, size=None):
+    """
+    Insert or update customers keyed by email with INSERT ... ON CONFLICT
+    DO UPDATE, one lookup and one INSERT per chunk.
+
+    Returns (customers, inserted, updated, [(row index, message), ...]).
+    When an email appears more than once the last row wins.
+    """
+    size = size or chunk_size()
+    errors, latest = [], {}
+    for index, data in enumerate(rows):
+        try:
+            cleaned = clean_customer(data)
+        except ValueError as e:
+            errors.append((index, str(e)))
+            continue
+        latest.pop(cleaned["email"], None)
+        latest[cleaned["email"]] = Customer(**cleaned)
+
+    customers, inserted, updated = [], 0, 0
+    with transaction.atomic():
+        for chunk in chunked(latest.values(), size):
+            # For the inserted/updated split, and so updated rows report their
+            # original created_at; the upsert itself doesn't need it.
+            stored = dict(
+                Customer.objects.filter(email__in=[c.email for c in chunk])
+                .values_list("email", "created_at")
+            )
+            customers.extend(
+                Customer.objects.bulk_create(
+                    chunk,
+                    batch_size=size,
+                    update_conflicts=True,
+                    unique_fields=["email"],
+                    update_fields=["name", "phone", "phone_digits"],
+                )
+            )
+            for customer in chunk:
+                if customer.email in stored:
+                    customer.created_at = stored[customer.email]
+            updated += len(stored)
+            inserted += len(chunk) - len(stored)
+    if customers:
+        bump_generation(Customer)
+    return customers, inserted, updated, errors
+
+
+def bulk_create_products(rows, size=None):
+    """Returns (created products, [(row index, message), ...])."""
+    size = size or chunk_size()
+    errors, products = [], []
+    for index, data in enumerate(rows):
+        try:
+            products.append(Product(**clean_product(data)))
+        except ValueError as e:
+            errors.append((index, str(e)))
+    created = []
+    with transaction.atomic():
+        for chunk in chunked(products, size):
+            created.extend(Product.objects.bulk_create(chunk))
+    if created:
+        bump_generation(Product)
+    return created, errors
+
+
+def _parse_id(value, label):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {label} ID: {value}")
+
+
+def clean_order(data):
+    """Validate one order row's shape; returns (customer_id, {product_id: quantity})."""
+    customer_id = _parse_id(data.get("customer_id"), "customer")
+    product_ids = [_parse_id(value, "product") for value in data.get("product_ids") or []]
+    if not product_ids:
+        raise ValueError("At least one product must be provided")
+    quantities = data.get("quantities")
+    if quantities is None:
+        quantities = [1] * len(product_ids)
+    if len(quantities) != len(product_ids):
+        raise ValueError("quantities must have one entry per product ID")
+    if any(quantity is None or quantity < 1 for quantity in quantities):
+        raise ValueError("Quantities must be positive")
+    lines = {}
+    for product_id, quantity in zip(product_ids, quantities):
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    return customer_id, lines
+
+
+def bulk_create_orders(rows, size=None):
+    """
+    Create orders with their line items at current product prices.
+
+    Customers and products are resolved with one IN query per chunk of ids,
+    then orders and items go in with bulk INSERTs. Totals are summed from
+    the same price snapshot the items store, so no recompute pass is
+    needed. Stock is not reserved: this is the backfill path; live orders
+    go through CreateOrder.
+
+    Returns (created orders, [(row index, message), ...]).
+    """
+    size = size or chunk_size()
+    errors, parsed = [], []
+    for index, data in enumerate(rows):
+        try:
+            parsed.append((index, *clean_order(data)))
+        except ValueError as e:
+            errors.append((index, str(e)))
+
+    customer_ids = existing_values(Customer, "pk", {c for _, c, _ in parsed}, size)
+    products = {}
+    for chunk in chunked({p for _, _, lines in parsed for p in lines}, size):
+        products.update(Product.objects.in_bulk(chunk))
+
+    valid = []
+    for index, customer_id, lines in parsed:
+        missing = [pk for pk in lines if pk not in products]
+        if customer_id not in customer_ids:
+            errors.append((index, f"Customer {customer_id} does not exist"))
+        elif missing:
+            errors.append((index, f"Products do not exist: {missing}"))
+        else:
+            total = sum(products[pk].price * quantity for pk, quantity in lines.items())
+            valid.append((Order(customer_id=customer_id, total_amount=total), lines))
+
+    created = []
+    with transaction.atomic():
+        for chunk in chunked(valid, size):
+            orders = Order.objects.bulk_create([order for order, _ in chunk])
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, product_id=pk, quantity=quantity,
+                              unit_price=products[pk].price)
+                    for order, (_, lines) in zip(orders, chunk)
+                    for pk, quantity in lines.items()
+                ],
+                batch_size=size,
+            )
+            created.extend(orders)
+    if created:
+        bump_generation(Order)
+        bump_generation(OrderItem)
+    errors.sort()
+    return created, errors
@@ -0,0 +1,164 @@
+import math
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from graphene.utils.str_converters import to_snake_case
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    InlineFragmentNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_composite_type,
+)
+from graphql.execution.values import get_argument_values
+
+from .counting import CACHE_TIMEOUT, table_estimate
+
+
+def model_row_count(model):
+    """Planner estimate for the table if ANALYZE has run, else COUNT(*)."""
+    # Costs only need the table's magnitude, so a few minutes' staleness is
+    # fine and keeps the check off the database on the hot path.
+    key = f"crm:rows:{model._meta.label_lower}"
+    count = cache.get(key)
+    if count is None:
+        count = table_estimate(model)
+        if count is None:
+            count = model._default_manager.count()
+        cache.set(key, count, CACHE_TIMEOUT)
+    return count
+
+
+def relation_fan_out(model, field_name):
+    """Average rows per `model` row behind the to-many relation `field_name`, or None."""
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return None
+    if field.many_to_many:
+        rows = getattr(field, "through", None) or field.remote_field.through
+    elif field.one_to_many:
+        rows = field.related_model
+    else:
+        return None
+    return max(math.ceil(model_row_count(rows) / max(model_row_count(model), 1)), 1)
+
+
+def graphql_model(graphql_type):
+    """The Django model behind an object type, or behind a connection's nodes."""
+    meta = getattr(getattr(graphql_type, "graphene_type", None), "_meta", None)
+    node = getattr(meta, "node", None)
+    if node is not None:
+        meta = node._meta
+    return getattr(meta, "model", None)
+
+
+class QueryCostAnalyzer:
+    """
+    Estimate how many objects an operation can touch before running it.
+
+    Every object costs 1. A list field multiplies the cost of its items by
+    the page size taken from the enclosing connection's `first`/`last`
+    arguments. An unbounded list uses its size from `list_sizes`
+    ("Type.field" -> size); failing that, a root list of a model type
+    (e.g. `orders`, which returns the whole table) uses the table's row
+    count, a relation list (e.g. `Order.products`) the relation's average
+    rows per parent, and anything else `default_list_size`. A connection
+    without `first`/`last` returns at most `default_list_size` rows.
+    """
+
+    def __init__(self, schema, document, variables=None, default_list_size=100, list_sizes=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.default_list_size = default_list_size
+        self.list_sizes = list_sizes or {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.document = document
+
+    def cost(self, operation_name=None):
+        operation = get_operation_ast(self.document, operation_name)
+        if operation is None:
+            return 0
+        root_type = self.schema.get_root_type(operation.operation)
+        return self.selection_cost(root_type, operation.selection_set, None)
+
+    def selection_cost(self, parent_type, selection_set, list_size):
+        total = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                total += self.field_cost(parent_type, selection, list_size)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                total += self.selection_cost(fragment_type, selection.selection_set, list_size)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                    total += self.selection_cost(fragment_type, fragment.selection_set, list_size)
+        return total
+
+    def field_cost(self, parent_type, node, list_size):
+        name = node.name.value
+        fields = getattr(parent_type, "fields", {})
+        if name.startswith("__") or name not in fields:
+            return 0
+        field_def = fields[name]
+        named_type = get_named_type(field_def.type)
+        if not is_composite_type(named_type) or node.selection_set is None:
+            return 0
+
+        # A connection field's first/last sizes the lists beneath it (edges).
+        page_size = self.page_size(field_def, node)
+        if page_size is None and ("first" in field_def.args or "last" in field_def.args):
+            page_size = min(
+                self.unbounded_list_size(parent_type, name, named_type), self.default_list_size
+            )
+        child_cost = 1 + self.selection_cost(named_type, node.selection_set, page_size)
+        if isinstance(get_nullable_type(field_def.type), GraphQLList):
+            if list_size is None:
+                list_size = self.unbounded_list_size(parent_type, name, named_type)
+            return list_size * child_cost
+        return child_cost
+
+    def unbounded_list_size(self, parent_type, name, named_type):
+        configured = self.list_sizes.get(f"{parent_type.name}.{name}")
+        if configured is not None:
+            return configured
+        if parent_type is self.schema.query_type:
+            model = graphql_model(named_type)
+            if model is not None:
+                return max(model_row_count(model), 1)
+        else:
+            model = graphql_model(parent_type)
+            fan_out = model and relation_fan_out(model, to_snake_case(name))
+            if fan_out is not None:
+                return fan_out
+        return self.default_list_size
+
+    def page_size(self, field_def, node):
+        if "first" not in field_def.args and "last" not in field_def.args:
+            return None
+        try:
+            args = get_argument_values(field_def, node, self.variables)
+        except GraphQLError:
+            return None
+        sizes = [args[k] for k in ("first", "last") if args.get(k) is not None]
+        return min(sizes) if sizes else None
+
+
+def estimate_cost(schema, document, operation_name=None, variables=None, default_list_size=100,
+                  list_sizes=None):
+    return QueryCostAnalyzer(
+        schema, document, variables, default_list_size, list_sizes
+    ).cost(operation_name)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import connection
+
+from .signals import DEPENDENCIES, generations
+
+PAGINATION_ARGS = ("first", "last", "before", "after", "offset")
+
+CACHE_TIMEOUT = 300
+
+
+def normalize_args(args):
+    filters = {k: v for k, v in args.items() if k not in PAGINATION_ARGS and v is not None}
+    return json.dumps(filters, sort_keys=True, default=str)
+
+
+def exact_count(queryset, args, cap):
+    return queryset.count(), True
+
+
+def count_cache_alias():
+    return getattr(settings, "CRM_COUNT_CACHE_ALIAS", DEFAULT_CACHE_ALIAS)
+
+
+def cached_count(queryset, args, cap):
+    # Exact only while every worker's writes reach the cache, i.e. with a
+    # cache shared between processes.
+    alias = count_cache_alias()
+    cache = caches[alias]
+    model = queryset.model
+    versions = generations(DEPENDENCIES.get(model, (model,)), alias)
+    digest = hashlib.sha1(normalize_args(args).encode()).hexdigest()
+    key = "crm:count:{}:{}:{}".format(
+        model._meta.label_lower, ".".join(map(str, versions)), digest
+    )
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, CACHE_TIMEOUT)
+    return count, True
+
+
+def capped_count(queryset, args, cap):
+    # COUNT over a LIMITed subquery stops scanning after cap + 1 rows.
+    count = queryset[: cap + 1].count()
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+def has_table_stats():
+    """Whether ANALYZE has created sqlite_stat1; probed once per database connection."""
+    connection.ensure_connection()
+    raw, found = getattr(connection, "crm_table_stats", (None, False))
+    if raw is not connection.connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            found = cursor.fetchone() is not None
+        connection.crm_table_stats = (connection.connection, found)
+    return found
+
+
+def table_estimate(model):
+    """Row count recorded by ANALYZE in sqlite_stat1, or None if unavailable."""
+    if connection.vendor != "sqlite" or not has_table_stats():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [model._meta.db_table])
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+    return max(int(stat.split()[0]) for (stat,) in rows)
+
+
+def estimated_count(queryset, args, cap):
+    # Planner stats only describe whole tables, so filtered sets get a capped count.
+    if normalize_args(args) == "{}":
+        estimate = table_estimate(queryset.model)
+        if estimate is not None:
+            return estimate, False
+    return capped_count(queryset, args, cap)
+
+
+COUNT_STRATEGIES = {
+    "exact": exact_count,
+    "cached": cached_count,
+    "capped": capped_count,
+    "estimate": estimated_count,
+}
+
+
+def count_queryset(queryset, args, strategy="exact", cap=10000):
+    """Return (count, is_exact) for `queryset` using the named strategy."""
+    return COUNT_STRATEGIES[strategy](queryset, args, cap)
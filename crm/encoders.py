@@ -0,0 +1,53 @@
+"""
+JSON encoders for GraphQL and export responses.
+
+orjson is used when installed; otherwise a reused stdlib JSONEncoder.
+Select one with the CRM_JSON_ENCODER setting ("auto", "orjson" or "json").
+"""
+import datetime
+import json
+from decimal import Decimal
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def default(value):
+    # Checked in order of frequency in crm responses: prices, then timestamps.
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Building a JSONEncoder per json.dumps() call with custom options is measurable
+# on small responses, so keep one around.
+_stdlib_encoder = json.JSONEncoder(separators=(",", ":"), default=default)
+
+
+def stdlib_dumps(data):
+    return _stdlib_encoder.encode(data)
+
+
+def orjson_dumps(data):
+    return orjson.dumps(data, default=default).decode("utf-8")
+
+
+ENCODERS = {"json": stdlib_dumps}
+if orjson is not None:
+    ENCODERS["orjson"] = orjson_dumps
+
+
+def get_encoder(name=None):
+    name = name or getattr(settings, "CRM_JSON_ENCODER", "auto")
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable JSON encoder: {name}")
@@ -0,0 +1,42 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from graphql.pyutils import Path, Undefined
+
+from .loaders import BatchingExecutionContext
+
+
+class ConcurrentExecutionContext(BatchingExecutionContext):
+    """
+    Resolve each root field of a query in its own worker thread.
+
+    The resolvers are synchronous ORM code, so a root field's whole subtree
+    runs in one thread while the event loop waits on all of them together.
+    Nested fields keep the normal (sync, batched) execution.
+    """
+
+    def execute_fields(self, parent_type, source_value, path, fields):
+        if path is not None:
+            return super().execute_fields(parent_type, source_value, path, fields)
+
+        def execute_root_field(response_name, field_nodes):
+            try:
+                return self.execute_field(
+                    parent_type, source_value, field_nodes, Path(None, response_name, parent_type.name)
+                )
+            finally:
+                # Worker threads never see request_finished; drop their connections here.
+                close_old_connections()
+
+        async def get_results():
+            names = list(fields)
+            values = await asyncio.gather(
+                *(
+                    sync_to_async(execute_root_field, thread_sensitive=False)(name, fields[name])
+                    for name in names
+                )
+            )
+            return {name: value for name, value in zip(names, values) if value is not Undefined}
+
+        return get_results()
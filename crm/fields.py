@@ -0,0 +1,173 @@
+import json
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from graphene.relay.connection import connection_adapter, page_info_adapter
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql import GraphQLError
+from graphql_relay.utils import base64, unbase64
+
+from .optimizer import include_fields
+
+KEYSET_PREFIX = "keyset:"
+
+
+def encode_cursor(values):
+    return base64(KEYSET_PREFIX + json.dumps(values, default=str))
+
+
+def decode_cursor(cursor):
+    """Return the decoded key values, or None for a legacy offset cursor."""
+    try:
+        raw = unbase64(cursor)
+    except Exception:
+        raw = ""
+    if not raw.startswith(KEYSET_PREFIX):
+        return None
+    try:
+        return json.loads(raw[len(KEYSET_PREFIX):])
+    except ValueError:
+        raise GraphQLError(f"Invalid cursor: {cursor}")
+
+
+class KeysetConnectionField(DjangoFilterConnectionField):
+    """
+    DjangoFilterConnectionField that pages by seek instead of OFFSET.
+
+    Rows are ordered by (sort_key, pk) and cursors carry both values, so
+    `after`/`before` become `WHERE (sort_key, pk) > (...)` predicates that
+    can walk an index no matter how deep the page is. Requests using
+    `offset` or offset cursors from the old fields fall back to the stock
+    graphene-django behaviour.
+    """
+
+    def __init__(self, type_, *args, sort_key="pk", count_strategy="exact", count_cap=10000, **kwargs):
+        self.sort_key = sort_key
+        self.count_strategy = count_strategy
+        self.count_cap = count_cap
+        super().__init__(type_, *args, **kwargs)
+
+    def wrap_resolve(self, parent_resolver):
+        return partial(
+            self.keyset_connection_resolver,
+            super().wrap_resolve(parent_resolver),
+            self.resolver or parent_resolver,
+        )
+
+    def keyset_connection_resolver(self, offset_resolver, resolver, root, info, **args):
+        after, before = args.get("after"), args.get("before")
+        if args.get("offset") is not None or any(
+            cursor is not None and decode_cursor(cursor) is None for cursor in (after, before)
+        ):
+            return offset_resolver(root, info, **args)
+
+        first, last = args.get("first"), args.get("last")
+        if self.enforce_first_or_last:
+            assert first or last, (
+                "You must provide a `first` or `last` value to properly paginate the `{}` connection."
+            ).format(info.field_name)
+        if self.max_limit:
+            for name, value in (("first", first), ("last", last)):
+                assert value is None or value <= self.max_limit, (
+                    "Requesting {} records on the `{}` connection exceeds the `{}` limit of {} records."
+                ).format(value, info.field_name, name, self.max_limit)
+            if first is None and last is None:
+                first = self.max_limit
+        for name, value in (("first", first), ("last", last)):
+            if value is not None and value < 0:
+                raise GraphQLError(f"Argument '{name}' must be a non-negative integer.")
+
+        iterable = resolver(root, info, **args)
+        if iterable is None:
+            iterable = self.get_manager()
+        queryset = self.get_queryset_resolver()(self.connection_type, iterable, info, args)
+        connection = self.resolve_keyset_connection(queryset, after, before, first, last)
+        # totalCount is computed lazily, and only if selected, over the filtered set.
+        connection.iterable = queryset
+        connection.count_args = args
+        connection.count_strategy = self.count_strategy
+        connection.count_cap = self.count_cap
+        return connection
+
+    def _key_fields(self, model):
+        descending = self.sort_key.startswith("-")
+        name = self.sort_key.lstrip("-")
+        pk_name = model._meta.pk.name
+        if name in ("pk", pk_name):
+            return [(pk_name, descending)]
+        return [(name, descending), (pk_name, descending)]
+
+    def _seek(self, queryset, keys, cursor, forward):
+        # (k, pk) > (v, id) written as k >= v AND (k > v OR pk > id) so the
+        # leading column stays a plain range predicate.
+        values = decode_cursor(cursor)
+        if values is None or len(values) != len(keys):
+            raise GraphQLError(f"Invalid cursor: {cursor}")
+        model = queryset.model
+        try:
+            values = [
+                model._meta.get_field(name).to_python(value) for (name, _), value in zip(keys, values)
+            ]
+        except (ValidationError, TypeError):
+            values = [None]
+        if None in values:
+            raise GraphQLError(f"Invalid cursor: {cursor}")
+
+        def op(descending, strict):
+            gt = forward != descending
+            return ("gt" if gt else "lt") if strict else ("gte" if gt else "lte")
+
+        (name, descending), value = keys[0], values[0]
+        if len(keys) == 1:
+            return queryset.filter(**{f"{name}__{op(descending, True)}": value})
+        (pk_name, pk_desc), pk_value = keys[1], values[1]
+        return queryset.filter(
+            Q(**{f"{name}__{op(descending, False)}": value}),
+            Q(**{f"{name}__{op(descending, True)}": value})
+            | Q(**{f"{pk_name}__{op(pk_desc, True)}": pk_value}),
+        )
+
+    def resolve_keyset_connection(self, queryset, after, before, first, last):
+        keys = self._key_fields(queryset.model)
+        ordering = [("-" if desc else "") + name for name, desc in keys]
+        reverse_ordering = [("" if desc else "-") + name for name, desc in keys]
+        queryset = include_fields(queryset, *(name for name, _ in keys))
+
+        if after:
+            queryset = self._seek(queryset, keys, after, forward=True)
+        if before:
+            queryset = self._seek(queryset, keys, before, forward=False)
+
+        has_next = has_previous = False
+        if first is not None:
+            rows = list(queryset.order_by(*ordering)[: first + 1])
+            has_next = len(rows) > first
+            rows = rows[:first]
+            if last is not None:
+                has_previous = len(rows) > last
+                rows = rows[len(rows) - last:] if last else []
+        elif last is not None:
+            rows = list(queryset.order_by(*reverse_ordering)[: last + 1])
+            has_previous = len(rows) > last
+            rows = rows[:last][::-1]
+        else:
+            rows = list(queryset.order_by(*ordering))
+
+        connection_type = self.connection_type
+        edges = [
+            connection_type.Edge(
+                node=row, cursor=encode_cursor([getattr(row, name) for name, _ in keys])
+            )
+            for row in rows
+        ]
+        return connection_adapter(
+            connection_type,
+            edges=edges,
+            pageInfo=page_info_adapter(
+                startCursor=edges[0].cursor if edges else None,
+                endCursor=edges[-1].cursor if edges else None,
+                hasPreviousPage=has_previous,
+                hasNextPage=has_next,
+            ),
+        )
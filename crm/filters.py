@@ -1,12 +1,14 @@
 import django_filters
-from .models import Customer, Order, Product
+
+from .models import Customer, Order, OrderItem, Product, normalize_phone
+from .search import search_contains
 
 class CustomerFilter(django_filters.FilterSet):
-    # Case-insensitive partial match for name
-    name = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
+    # Case-insensitive partial match for name (trigram index, see crm/search.py)
+    name = django_filters.CharFilter(field_name="name", method="filter_search")
 
     # Case-insensitive partial match for email
-    email = django_filters.CharFilter(field_name="email", lookup_expr="icontains")
+    email = django_filters.CharFilter(field_name="email", method="filter_search")
 
     # Date range filters
     created_at__gte = django_filters.DateFilter(field_name="created_at", lookup_expr="gte")
@@ -15,9 +17,18 @@ class CustomerFilter(django_filters.FilterSet):
     # Custom filter: phone starts with "+1"
     phone_pattern = django_filters.CharFilter(method="filter_phone_pattern")
 
+    def filter_search(self, queryset, name, value):
+        return search_contains(queryset, name, value)
+
     def filter_phone_pattern(self, queryset, name, value):
-        # This allows pattern-based matching for phone numbers
-        return queryset.filter(phone__startswith=value)
+        # "+1 (555)" and "1555" both mean the digit prefix "1555". The prefix
+        # match is written as a range so it can use the phone_digits index;
+        # SQLite's case-insensitive LIKE (startswith) never does.
+        digits = normalize_phone(value)
+        if digits is None:
+            return queryset.none()
+        upper = digits[:-1] + chr(ord(digits[-1]) + 1)
+        return queryset.filter(phone_digits__gte=digits, phone_digits__lt=upper)
 
     class Meta:
         model = Customer
@@ -26,12 +37,15 @@ class CustomerFilter(django_filters.FilterSet):
 
 
 class ProductFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
+    name = django_filters.CharFilter(field_name="name", method="filter_search")
     price__gte = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
     price__lte = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
     stock__gte = django_filters.NumberFilter(field_name="stock", lookup_expr="gte")
     stock__lte = django_filters.NumberFilter(field_name="stock", lookup_expr="lte")
 
+    def filter_search(self, queryset, name, value):
+        return search_contains(queryset, name, value)
+
     class Meta:
         model = Product
         fields = ["name", "price", "stock"]
@@ -44,12 +58,31 @@ class OrderFilter(django_filters.FilterSet):
     order_date__gte = django_filters.DateFilter(field_name="order_date", lookup_expr="gte")
     order_date__lte = django_filters.DateFilter(field_name="order_date", lookup_expr="lte")
 
-    # Related model filtering
-    customer_name = django_filters.CharFilter(field_name="customer__name", lookup_expr="icontains")
-    product_name = django_filters.CharFilter(field_name="product__name", lookup_expr="icontains")
+    # Related model filtering. These go through IN subqueries rather than joins:
+    # joining the products M2M repeats an order once per matching product.
+    customer_name = django_filters.CharFilter(method="filter_customer_name")
+    product_name = django_filters.CharFilter(method="filter_product_name")
 
     # Challenge: Filter orders that include a specific product ID
-    product_id = django_filters.NumberFilter(field_name="product__id")
+    product_id = django_filters.NumberFilter(method="filter_product_id")
+
+    def filter_customer_name(self, queryset, name, value):
+        # customer_id IN (matching customers) walks the customer_id index
+        customers = search_contains(Customer.objects.all(), "name", value)
+        return queryset.filter(customer__in=customers.values("pk"))
+
+    def filter_product_name(self, queryset, name, value):
+        products = search_contains(Product.objects.all(), "name", value)
+        return queryset.filter(pk__in=self.orders_with(product_id__in=products.values("pk")))
+
+    def filter_product_id(self, queryset, name, value):
+        return queryset.filter(pk__in=self.orders_with(product_id=value))
+
+    @staticmethod
+    def orders_with(**lookups):
+        # An uncorrelated semi-join: SQLite drives it from the through table's
+        # product_id index, where a correlated EXISTS would scan every order.
+        return OrderItem.objects.filter(**lookups).values("order_id")
 
     class Meta:
         model = Order
@@ -0,0 +1,220 @@
+"""
+@defer / @stream support on top of graphql-core 3.2, which validates but
+does not implement incremental delivery itself.
+
+IncrementalExecutionContext leaves deferred fragments and the tail of
+streamed lists out of the initial result and queues them; the view then
+drains `subsequent_payloads()` into a multipart/mixed response.
+"""
+from collections import deque
+from itertools import islice
+
+from django.db.models import QuerySet
+from graphql import (
+    DirectiveLocation,
+    ExecutionResult,
+    FieldNode,
+    GraphQLArgument,
+    GraphQLBoolean,
+    GraphQLDirective,
+    GraphQLError,
+    GraphQLInt,
+    GraphQLNonNull,
+    GraphQLString,
+    InlineFragmentNode,
+    OperationType,
+    located_error,
+)
+from graphql.execution.collect_fields import (
+    does_fragment_condition_match,
+    get_field_entry_key,
+    should_include_node,
+)
+from graphql.execution.execute import invalid_return_type_error
+from graphql.execution.values import get_directive_values
+
+from .loaders import BatchingExecutionContext, get_loaders
+
+DeferDirective = GraphQLDirective(
+    name="defer",
+    locations=[DirectiveLocation.FRAGMENT_SPREAD, DirectiveLocation.INLINE_FRAGMENT],
+    args={
+        "if": GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        "label": GraphQLArgument(GraphQLString),
+    },
+    description="Deliver the fragment in a later payload.",
+)
+
+StreamDirective = GraphQLDirective(
+    name="stream",
+    locations=[DirectiveLocation.FIELD],
+    args={
+        "if": GraphQLArgument(GraphQLNonNull(GraphQLBoolean), default_value=True),
+        "label": GraphQLArgument(GraphQLString),
+        "initialCount": GraphQLArgument(GraphQLNonNull(GraphQLInt), default_value=0),
+    },
+    description="Deliver the list items after `initialCount` in later payloads.",
+)
+
+STREAM_CHUNK_SIZE = 100
+
+
+class IncrementalExecutionContext(BatchingExecutionContext):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending = deque()
+        self._split_cache = {}
+
+    def directive_args(self, directive, node):
+        values = get_directive_values(directive, node, self.variable_values)
+        if values is None or not values["if"]:
+            return None
+        return values
+
+    def split_fields(self, runtime_type, selection_sets):
+        """collect_fields that sets @defer fragments aside instead of merging them."""
+        fields, deferred, visited = {}, [], set()
+
+        def walk(selection_set, into):
+            for selection in selection_set.selections:
+                if not should_include_node(self.variable_values, selection):
+                    continue
+                if isinstance(selection, FieldNode):
+                    into.setdefault(get_field_entry_key(selection), []).append(selection)
+                    continue
+                if isinstance(selection, InlineFragmentNode):
+                    fragment = selection
+                else:
+                    name = selection.name.value
+                    if name in visited:
+                        continue
+                    visited.add(name)
+                    fragment = self.fragments.get(name)
+                if fragment is None or not does_fragment_condition_match(
+                    self.schema, fragment, runtime_type
+                ):
+                    continue
+                defer = self.directive_args(DeferDirective, selection)
+                if defer is not None:
+                    group = {}
+                    walk(fragment.selection_set, group)
+                    deferred.append((defer.get("label"), group))
+                else:
+                    walk(fragment.selection_set, into)
+
+        for selection_set in selection_sets:
+            walk(selection_set, fields)
+        return fields, deferred
+
+    def defer(self, parent_type, source, path, deferred):
+        for label, group in deferred:
+            self.pending.append(("defer", label, (parent_type, source, path, group)))
+
+    def execute_operation(self, operation, root_value):
+        root_type = self.schema.get_root_type(operation.operation)
+        if root_type is None or operation.operation != OperationType.QUERY:
+            return super().execute_operation(operation, root_value)
+        fields, deferred = self.split_fields(root_type, [operation.selection_set])
+        self.defer(root_type, root_value, None, deferred)
+        return self.execute_fields(root_type, root_value, None, fields)
+
+    def complete_object_value(self, return_type, field_nodes, info, path, result):
+        key = (return_type, *map(id, field_nodes))
+        split = self._split_cache.get(key)
+        if split is None:
+            split = self.split_fields(return_type, [node.selection_set for node in field_nodes])
+            self._split_cache[key] = split
+        fields, deferred = split
+        if return_type.is_type_of and not return_type.is_type_of(result, info):
+            raise invalid_return_type_error(return_type, result, field_nodes)
+        self.defer(return_type, result, path, deferred)
+        return self.execute_fields(return_type, result, path, fields)
+
+    def complete_list_value(self, return_type, field_nodes, info, path, result):
+        stream = self.directive_args(StreamDirective, field_nodes[0])
+        if stream is None:
+            return super().complete_list_value(return_type, field_nodes, info, path, result)
+        if isinstance(result, QuerySet):
+            # Stream straight off the cursor instead of loading the whole list.
+            items = result.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        else:
+            items = iter(result)
+        initial_count = max(stream["initialCount"], 0)
+        initial = list(islice(items, initial_count))
+        self.pending.append(
+            ("stream", stream.get("label"), (return_type.of_type, field_nodes, info, path, items, initial_count))
+        )
+        return super().complete_list_value(return_type, field_nodes, info, path, initial)
+
+    def complete_stream_item(self, item_type, field_nodes, info, item_path, item):
+        try:
+            return self.complete_value(item_type, field_nodes, info, item_path, item)
+        except Exception as raw_error:
+            error = located_error(raw_error, field_nodes, item_path.as_list())
+            self.handle_field_error(error, item_type)
+            return None
+
+    def subsequent_payloads(self):
+        """Yield incremental payloads until all deferred and streamed work is done."""
+        has_next = True
+        while self.pending:
+            kind, label, work = self.pending.popleft()
+            errors_before = len(self.errors)
+            if kind == "defer":
+                parent_type, source, path, group = work
+                try:
+                    data = self.execute_fields(parent_type, source, path, group)
+                except GraphQLError as error:
+                    self.errors.append(error)
+                    data = None
+                entry = {"data": data, "path": path.as_list() if path else []}
+            else:
+                item_type, field_nodes, info, path, items, index = work
+                chunk = list(islice(items, STREAM_CHUNK_SIZE))
+                if not chunk:
+                    continue
+                if len(chunk) > 1:
+                    get_loaders(info).prime_siblings(chunk)
+                completed = []
+                for offset, item in enumerate(chunk):
+                    item_path = path.add_key(index + offset, None)
+                    completed.append(
+                        self.complete_stream_item(item_type, field_nodes, info, item_path, item)
+                    )
+                entry = {"items": completed, "path": path.as_list() + [index]}
+                if len(chunk) == STREAM_CHUNK_SIZE:
+                    # More rows may follow; keep draining this stream first.
+                    self.pending.appendleft((kind, label, (item_type, field_nodes, info, path, items, index + len(chunk))))
+            if label is not None:
+                entry["label"] = label
+            new_errors = self.errors[errors_before:]
+            if new_errors:
+                entry["errors"] = [error.formatted for error in new_errors]
+            has_next = bool(self.pending)
+            yield {"incremental": [entry], "hasNext": has_next}
+        if has_next:
+            # The last stream ended on a chunk boundary; close the response.
+            yield {"hasNext": False}
+
+
+def execute_incremental(schema, document, root_value=None, context_value=None,
+                        variable_values=None, operation_name=None, middleware=None, **kwargs):
+    """Like graphql.execute, but also returns the context holding the pending payloads."""
+    context = IncrementalExecutionContext.build(
+        schema,
+        document,
+        root_value=root_value,
+        context_value=context_value,
+        raw_variable_values=variable_values,
+        operation_name=operation_name,
+        middleware=middleware,
+    )
+    if isinstance(context, list):
+        return ExecutionResult(data=None, errors=context), None
+    try:
+        data = context.execute_operation(context.operation, root_value)
+    except GraphQLError as error:
+        context.errors.append(error)
+        data = None
+    # Copy the errors: later payloads keep appending to context.errors.
+    return context.build_response(data, list(context.errors)), context
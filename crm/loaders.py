@@ -0,0 +1,168 @@
+import threading
+from collections import defaultdict
+
+from django.db.models import QuerySet
+from graphql.execution import ExecutionContext
+
+from .models import Customer, Order, OrderItem, Product
+
+
+class BatchLoader:
+    """
+    Synchronous DataLoader: keys are queued with `prime()` and the first
+    `load()` that misses the cache fetches every queued key in one query.
+    """
+
+    def __init__(self, batch_load_fn, default=None):
+        self.batch_load_fn = batch_load_fn
+        self.default = default
+        self._cache = {}
+        self._queue = []
+        # Root fields may resolve concurrently in worker threads (async view).
+        self._lock = threading.RLock()
+
+    def prime(self, keys):
+        with self._lock:
+            self._queue.extend(k for k in keys if k is not None and k not in self._cache)
+
+    def load(self, key):
+        with self._lock:
+            if key not in self._cache:
+                self._queue.append(key)
+                self.dispatch()
+            return self._cache[key]
+
+    def dispatch(self):
+        with self._lock:
+            keys = list(dict.fromkeys(k for k in self._queue if k not in self._cache))
+            self._queue = []
+            if not keys:
+                return
+            found = self.batch_load_fn(keys)
+            for key in keys:
+                value = found.get(key, self.default)
+                self._cache[key] = list(value) if isinstance(value, list) else value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._queue = []
+
+
+def _load_customers(keys):
+    return Customer.objects.in_bulk(keys)
+
+
+def _load_order_products(keys):
+    grouped = defaultdict(list)
+    rows = OrderItem.objects.filter(order_id__in=keys).select_related("product")
+    for row in rows:
+        grouped[row.order_id].append(row.product)
+    return grouped
+
+
+def _load_order_items(keys):
+    grouped = defaultdict(list)
+    for row in OrderItem.objects.filter(order_id__in=keys).select_related("product"):
+        grouped[row.order_id].append(row)
+    return grouped
+
+
+def _load_customer_orders(keys):
+    grouped = defaultdict(list)
+    for order in Order.objects.filter(customer_id__in=keys):
+        grouped[order.customer_id].append(order)
+    return grouped
+
+
+def _load_product_orders(keys):
+    grouped = defaultdict(list)
+    rows = OrderItem.objects.filter(product_id__in=keys).select_related("order")
+    for row in rows:
+        grouped[row.product_id].append(row.order)
+    return grouped
+
+
+class Loaders:
+    """All loaders for one request, keyed by the relation they serve."""
+
+    def __init__(self):
+        self.order_customer = BatchLoader(_load_customers)
+        self.order_products = BatchLoader(_load_order_products, default=[])
+        self.order_items = BatchLoader(_load_order_items, default=[])
+        self.customer_orders = BatchLoader(_load_customer_orders, default=[])
+        self.product_orders = BatchLoader(_load_product_orders, default=[])
+
+    def prime_siblings(self, instances):
+        # Only queue keys; nothing is fetched unless a child field asks for it.
+        if not instances:
+            return
+        model = type(instances[0])
+        if model is Order:
+            # vars() so a deferred customer_id is skipped instead of fetched per row
+            self.order_customer.prime(vars(o).get("customer_id") for o in instances)
+            self.order_products.prime(o.pk for o in instances)
+            self.order_items.prime(o.pk for o in instances)
+        elif model is Customer:
+            self.customer_orders.prime(c.pk for c in instances)
+        elif model is Product:
+            self.product_orders.prime(p.pk for p in instances)
+
+    def clear(self):
+        for loader in vars(self).values():
+            loader.clear()
+
+
+# relation name -> (loader attribute, key attribute on the parent instance)
+RELATIONS = {
+    (Order, "customer"): ("order_customer", "customer_id"),
+    (Order, "products"): ("order_products", "pk"),
+    (Order, "items"): ("order_items", "pk"),
+    (Customer, "orders"): ("customer_orders", "pk"),
+    (Product, "orders"): ("product_orders", "pk"),
+}
+
+
+_loaders_lock = threading.Lock()
+
+
+def get_loaders(info):
+    context = info.context
+    if context is None:
+        return Loaders()
+    loaders = getattr(context, "crm_loaders", None)
+    if loaders is None:
+        with _loaders_lock:
+            loaders = getattr(context, "crm_loaders", None)
+            if loaders is None:
+                loaders = Loaders()
+                setattr(context, "crm_loaders", loaders)
+    return loaders
+
+
+def load_related(info, instance, name):
+    """Resolve `instance.<name>` through the request loaders unless it is already cached."""
+    if name in getattr(instance, "_prefetched_objects_cache", {}):
+        return list(getattr(instance, name).all())
+    field = instance._meta.get_field(name)
+    if not field.many_to_many and not field.one_to_many and field.is_cached(instance):
+        return getattr(instance, name)
+
+    loader_name, key_attr = RELATIONS[(type(instance), name)]
+    return getattr(get_loaders(info), loader_name).load(getattr(instance, key_attr))
+
+
+class BatchingExecutionContext(ExecutionContext):
+    """
+    graphql-core completes list items depth-first, so a child resolver never
+    sees its siblings. Queue their keys here before the items are completed.
+    """
+
+    def complete_list_value(self, return_type, field_nodes, info, path, result):
+        if isinstance(result, QuerySet):
+            result = list(result)
+        if isinstance(result, list) and len(result) > 1:
+            instances = [getattr(item, "node", item) for item in result]
+            if all(isinstance(i, (Customer, Order, Product)) for i in instances):
+                get_loaders(info).prime_siblings(instances)
+        return super().complete_list_value(return_type, field_nodes, info, path, result)
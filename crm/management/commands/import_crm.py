@@ -0,0 +1,143 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from crm import bulk
+from crm.models import ImportCheckpoint
+
+IMPORTERS = {
+    "customers": bulk.bulk_create_customers,
+    "products": bulk.bulk_create_products,
+}
+
+# Seconds between progress lines while importing
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream customers or products from a CSV or NDJSON file into the database, "
+        "validating rows like createCustomer/createProduct and inserting them in "
+        "chunked bulk INSERTs, one transaction per chunk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(IMPORTERS))
+        parser.add_argument("path", help="input file, or - for stdin")
+        parser.add_argument("--format", choices=["csv", "ndjson"],
+                            help="input format; defaults to the file extension")
+        parser.add_argument("--chunk-size", type=int, default=None,
+                            help="rows per transaction (default: CRM_BULK_CHUNK_SIZE)")
+        parser.add_argument("--checkpoint", default=None,
+                            help="checkpoint name (default: the input file's absolute path)")
+        parser.add_argument("--resume", action="store_true",
+                            help="skip the rows a previous run already committed")
+
+    def handle(self, resource, path, format=None, chunk_size=None, checkpoint=None, resume=False, **options):
+        size = bulk.chunk_size() if chunk_size is None else chunk_size
+        if size < 1:
+            raise CommandError("--chunk-size must be positive")
+        format = format or self.guess_format(path)
+        if path != "-":
+            path = os.path.abspath(path)
+        if checkpoint is None:
+            if path == "-":
+                raise CommandError("--checkpoint is required when reading stdin")
+            checkpoint = path
+
+        skip = self.read_checkpoint(checkpoint, resource, path) if resume else 0
+        if skip:
+            self.stdout.write(f"Resuming after line {skip}")
+        state, _ = ImportCheckpoint.objects.update_or_create(
+            name=checkpoint, defaults={"resource": resource, "path": path, "line": skip}
+        )
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            rows = self.read_rows(stream, format, skip)
+            self.import_rows(IMPORTERS[resource], rows, size, state)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        state.delete()
+
+    def import_rows(self, importer, rows, size, state):
+        read = created = rejected = 0
+        started = last_report = time.monotonic()
+        for chunk in bulk.chunked(rows, size):
+            # Unparseable lines arrive as ValueError; the rest go to the importer
+            # with their line numbers kept for error reporting.
+            valid = [(line, row) for line, row in chunk if not isinstance(row, ValueError)]
+            with transaction.atomic():
+                objects, errors = importer([row for _, row in valid])
+                # Committed with the rows, so a crash replays nothing.
+                state.line = chunk[-1][0]
+                state.save(update_fields=["line", "updated_at"])
+            errors = sorted(
+                [(valid[i][0], message) for i, message in errors]
+                + [(line, str(row)) for line, row in chunk if isinstance(row, ValueError)]
+            )
+            for line, message in errors:
+                self.stderr.write(f"row {line}: {message}")
+            read += len(chunk)
+            created += len(objects)
+            rejected += len(errors)
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                self.stdout.write(self.progress(read, state.line, created, rejected, now - started))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            self.progress(read, state.line, created, rejected, elapsed)
+        ))
+
+    @staticmethod
+    def progress(read, line, created, rejected, elapsed):
+        rate = read / elapsed if elapsed else 0
+        return (f"{read} rows read to line {line}, {created} created, {rejected} rejected "
+                f"in {elapsed:.1f}s ({rate:.0f} rows/s)")
+
+    @staticmethod
+    def guess_format(path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".csv":
+            return "csv"
+        if extension in (".ndjson", ".jsonl"):
+            return "ndjson"
+        raise CommandError("Cannot tell the input format; pass --format csv or --format ndjson")
+
+    @staticmethod
+    def read_rows(stream, format, skip=0):
+        """Yield (line number, row) for the rows after line `skip`."""
+        if format == "csv":
+            reader = csv.DictReader(stream)
+            for row in reader:
+                # line_num is where the record ends; the same line unless a quoted cell spans lines.
+                if reader.line_num <= skip:
+                    continue
+                # Empty CSV cells mean "not given", like a missing JSON key.
+                yield reader.line_num, {key: value for key, value in row.items() if value != ""}
+            return
+        for line, text in enumerate(stream, 1):
+            if line <= skip or not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError as e:
+                yield line, ValueError(f"Invalid JSON: {e}")
+
+    @staticmethod
+    def read_checkpoint(name, resource, path):
+        state = ImportCheckpoint.objects.filter(name=name).first()
+        if state is None:
+            return 0
+        if state.resource != resource or state.path != path:
+            raise CommandError(f"Checkpoint {name} belongs to another import ({state.resource} from {state.path})")
+        return state.line
@@ -0,0 +1,69 @@
+from django.db import migrations, OperationalError
+
+# External-content FTS5 tables: the index stores trigrams only and reads the
+# text back from the base table. Triggers keep it in step with every write,
+# including bulk_create() and queryset.update().
+#
+# SQLite drops a table's triggers when Django remakes it (e.g. for some
+# AlterField/AddField operations), so a later migration that remakes
+# crm_customer or crm_product must run these statements again.
+SEARCH_INDEXES = {
+    "crm_customer": ("crm_customer_fts", ("name", "email")),
+    "crm_product": ("crm_product_fts", ("name",)),
+}
+
+
+def index_sql(table, fts_table, columns):
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    delete = f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5({cols}, content='{table}', "
+        f"content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END",
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def trigram_supported(schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return False
+    try:
+        schema_editor.execute("CREATE VIRTUAL TABLE temp.crm_fts_probe USING fts5(x, tokenize='trigram')")
+    except OperationalError:
+        # FTS5 not compiled in, or SQLite older than 3.34; filters fall back to LIKE.
+        return False
+    schema_editor.execute("DROP TABLE temp.crm_fts_probe")
+    return True
+
+
+def create_search_indexes(apps, schema_editor):
+    if not trigram_supported(schema_editor):
+        return
+    for table, (fts_table, columns) in SEARCH_INDEXES.items():
+        for statement in index_sql(table, fts_table, columns):
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for fts_table, _ in SEARCH_INDEXES.values():
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-15 02:28
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_phone_digits(apps, schema_editor):
+    Customer = apps.get_model('crm', 'Customer')
+    customers = list(Customer.objects.exclude(phone=None).only('id', 'phone'))
+    for customer in customers:
+        customer.phone_digits = re.sub(r'\D', '', customer.phone or '') or None
+    Customer.objects.bulk_update(customers, ['phone_digits'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_phone_digits, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_digits'], name='crm_customer_phone_digits'),
+        ),
+        # phone_pattern now scans phone_digits; nothing filters on phone itself.
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='crm_customer_phone',
+        ),
+    ]
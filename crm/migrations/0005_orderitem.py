@@ -0,0 +1,60 @@
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_unit_price(apps, schema_editor):
+    # Existing lines snapshot the price their product has now; it is the best
+    # record available. Quantities default to 1, which is what a bare M2M meant.
+    OrderItem = apps.get_model('crm', 'OrderItem')
+    Product = apps.get_model('crm', 'Product')
+    OrderItem.objects.update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_customer_phone_digits'),
+    ]
+
+    operations = [
+        # Adopt the auto-created crm_order_products table as OrderItem without
+        # touching the database, then add the new columns to it.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='OrderItem',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='crm.order')),
+                        ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='crm.product')),
+                    ],
+                    options={
+                        'db_table': 'crm_order_products',
+                        'unique_together': {('order', 'product')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='order',
+                    name='products',
+                    field=models.ManyToManyField(related_name='orders', through='crm.OrderItem', to='crm.product'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_unit_price, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,52 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+import re
+
+
+def normalize_phone(value):
+    """Digits of a phone number with formatting stripped ("+1 555-0100" -> "15550100")."""
+    if not value:
+        return None
+    return re.sub(r"\D", "", value) or None
+
+
+class CustomerQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create() skips save(), so fill the derived column here too.
+        objs = list(objs)
+        for obj in objs:
+            obj.phone_digits = normalize_phone(obj.phone)
+        return super().bulk_create(objs, *args, **kwargs)
 
 
 class Customer(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
+    # normalize_phone(phone), kept in step by save() and bulk_create()
+    phone_digits = models.CharField(max_length=20, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CustomerQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # created_at range filters and the (created_at, id) keyset order
+            models.Index(fields=["created_at", "id"], name="crm_customer_created_id"),
+            # prefix range scans for phone_pattern
+            models.Index(fields=["phone_digits"], name="crm_customer_phone_digits"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.phone_digits = normalize_phone(self.phone)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "phone" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "phone_digits"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -18,20 +56,92 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     stock = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["price", "id"], name="crm_product_price_id"),
+            models.Index(fields=["stock"], name="crm_product_stock"),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class OrderQuerySet(models.QuerySet):
+    def recalculate_totals(self):
+        """Recompute total_amount for every order in the queryset with one UPDATE."""
+        from .signals import bump_generation
+
+        totals = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .values("order")
+            .annotate(total=Sum(OrderItem.line_total()))
+            .values("total")
+        )
+        updated = self.update(total_amount=Coalesce(Subquery(totals), Decimal("0")))
+        # update() sends no post_save, so invalidate cached reads here.
+        bump_generation(Order)
+        return updated
+
+
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders")
-    products = models.ManyToManyField(Product, related_name="orders")
+    products = models.ManyToManyField(Product, related_name="orders", through="OrderItem")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     order_date = models.DateTimeField(auto_now_add=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # order_date range filters and the (order_date, id) keyset order
+            models.Index(fields=["order_date", "id"], name="crm_order_date_id"),
+            # a customer's orders by date
+            models.Index(fields=["customer", "order_date"], name="crm_order_customer_date"),
+            models.Index(fields=["total_amount"], name="crm_order_total"),
+        ]
+
     def calculate_total(self):
-        total = sum(p.price for p in self.products.all())
-        self.total_amount = total
-        self.save()
+        # Line items carry the price paid, so later price changes don't move the total.
+        total = self.items.aggregate(total=Sum(OrderItem.line_total()))["total"]
+        self.total_amount = (total or Decimal("0")).quantize(Decimal("0.01"))
+        self.save(update_fields=["total_amount"])
 
     def __str__(self):
         return f"Order {self.id} - {self.customer.name}"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="order_items")
+    quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    # Product.price when the order was placed
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        # The table Order.products used before it had a through model.
+        db_table = "crm_order_products"
+        unique_together = [("order", "product")]
+
+    @staticmethod
+    def line_total():
+        return ExpressionWrapper(
+            F("quantity") * F("unit_price"),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} @ {self.unit_price}"
+
+
+class ImportCheckpoint(models.Model):
+    """How far an import_crm run got; updated in the same transaction as each chunk."""
+
+    name = models.CharField(max_length=255, unique=True)
+    resource = models.CharField(max_length=20)
+    path = models.CharField(max_length=1024)
+    # Last input line whose row is committed
+    line = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.resource} from {self.path} through line {self.line}"
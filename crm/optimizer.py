@@ -0,0 +1,99 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.utils import maybe_queryset
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+def collect_fields(info, selection_sets):
+    """Merge the selections of `selection_sets` by field name, expanding fragments."""
+    fields = {}
+
+    def walk(selection_set):
+        if selection_set is None:
+            return
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields.setdefault(selection.name.value, []).append(selection.selection_set)
+            elif isinstance(selection, InlineFragmentNode):
+                walk(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment is not None:
+                    walk(fragment.selection_set)
+
+    for selection_set in selection_sets:
+        walk(selection_set)
+    return fields
+
+
+def unwrap_connection(info, fields):
+    # `edges { node { ... } }` -> the fields selected on the node itself
+    if "edges" not in fields:
+        return fields
+    edges = collect_fields(info, fields["edges"])
+    return collect_fields(info, edges.get("node", []))
+
+
+def _plan(info, model, fields, prefix, only, select_related, prefetches):
+    for name, selection_sets in fields.items():
+        if name.startswith("__"):
+            continue
+        field_name = to_snake_case(name)
+        if field_name == "id":
+            only.add(prefix + model._meta.pk.name)
+            continue
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # Resolved by custom code we can't see into; load every column.
+            only.add(None)
+            continue
+
+        if field.many_to_one or field.one_to_one:
+            only.add(prefix + field.name)
+            select_related.add(prefix + field.name)
+            child = unwrap_connection(info, collect_fields(info, selection_sets))
+            _plan(info, field.related_model, child, prefix + field.name + "__",
+                  only, select_related, prefetches)
+        elif field.many_to_many or field.one_to_many:
+            child = unwrap_connection(info, collect_fields(info, selection_sets))
+            queryset = build_queryset(info, field.related_model._default_manager.all(), child)
+            if field.one_to_many:
+                # The reverse FK column is needed to attach rows to their parent.
+                queryset = include_fields(queryset, field.field.name)
+            prefetches.append(Prefetch(prefix + field.name, queryset=queryset))
+        else:
+            only.add(prefix + field.name)
+
+
+def include_fields(queryset, *field_names):
+    """Make sure `field_names` survive an earlier only() on `queryset`."""
+    deferred, is_deferred = queryset.query.deferred_loading
+    if is_deferred or not deferred:
+        return queryset
+    return queryset.only(*deferred, *field_names)
+
+
+def build_queryset(info, queryset, fields):
+    only, select_related, prefetches = set(), set(), []
+    _plan(info, queryset.model, fields, "", only, select_related, prefetches)
+    if select_related:
+        queryset = queryset.select_related(*sorted(select_related))
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if only and None not in only:
+        queryset = queryset.only(*sorted(only))
+    return queryset
+
+
+def optimize(queryset, info):
+    """
+    Restrict `queryset` to the columns and relations selected under the
+    field currently being resolved.
+    """
+    queryset = maybe_queryset(queryset)
+    if not isinstance(queryset, QuerySet):
+        return queryset
+    fields = collect_fields(info, [node.selection_set for node in info.field_nodes])
+    return build_queryset(info, queryset, unwrap_connection(info, fields))
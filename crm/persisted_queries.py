@@ -0,0 +1,62 @@
+import hashlib
+import json
+
+from django.conf import settings
+from graphql import GraphQLError
+
+from .lru import LRUCache
+
+store = LRUCache(getattr(settings, "CRM_PERSISTED_QUERY_MAX_ENTRIES", 5000))
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code, status_code=400):
+        super().__init__(message, extensions={"code": code})
+        self.status_code = status_code
+
+
+def get_persisted_query_extension(request, data):
+    extensions = request.GET.get("extensions") or data.get("extensions")
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+    if not isinstance(extensions, dict):
+        return None
+    return extensions.get("persistedQuery")
+
+
+def resolve_persisted_query(request, data):
+    """
+    Apollo-style automatic persisted queries.
+
+    Returns (query, sha256) for the request. A hash without a query is looked
+    up in the store; a hash sent together with its query registers it.
+    """
+    query = request.GET.get("query") or data.get("query")
+    persisted = get_persisted_query_extension(request, data)
+    if not persisted:
+        return query, query_hash(query) if query else None
+
+    if persisted.get("version") != 1:
+        raise PersistedQueryError("Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED")
+    sha256 = persisted.get("sha256Hash")
+    if not isinstance(sha256, str):
+        raise PersistedQueryError("Missing sha256Hash", "BAD_REQUEST")
+
+    if query:
+        if query_hash(query) != sha256:
+            raise PersistedQueryError("provided sha does not match query", "BAD_REQUEST")
+        store.set(sha256, query)
+        return query, sha256
+
+    query = store.get(sha256)
+    if query is None:
+        # Clients retry with the full document on this error, so it is not a 4xx.
+        raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND", status_code=200)
+    return query, sha256
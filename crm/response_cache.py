@@ -0,0 +1,104 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    InlineFragmentNode,
+    get_named_type,
+    print_ast,
+)
+
+from .signals import DEPENDENCIES, agenerations, generations
+
+
+def get_config():
+    """The CRM_RESPONSE_CACHE setting, or None when response caching is off."""
+    return getattr(settings, "CRM_RESPONSE_CACHE", None)
+
+
+def operation_models(schema, document, operation):
+    """Django models whose rows can appear in (or filter) the operation's result."""
+    fragments = {
+        d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)
+    }
+    models = set()
+
+    def walk(parent_type, selection_set):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields = getattr(parent_type, "fields", {})
+                name = selection.name.value
+                if name not in fields or selection.selection_set is None:
+                    continue
+                named_type = get_named_type(fields[name].type)
+                meta = getattr(getattr(named_type, "graphene_type", None), "_meta", None)
+                model = getattr(meta, "model", None)
+                if model is not None:
+                    models.update(DEPENDENCIES.get(model, (model,)))
+                walk(named_type, selection.selection_set)
+            elif isinstance(selection, InlineFragmentNode):
+                walk(parent_type, selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = fragments.get(selection.name.value)
+                if fragment is not None:
+                    walk(schema.get_type(fragment.type_condition.name.value), fragment.selection_set)
+
+    walk(schema.get_root_type(operation.operation), operation.selection_set)
+    return sorted(models, key=lambda m: m._meta.label_lower)
+
+
+def cache_key(document, operation_name, variables):
+    # print_ast drops whitespace, comments and formatting differences.
+    payload = json.dumps(
+        [print_ast(document), operation_name, variables or {}], sort_keys=True, default=str
+    )
+    return "crm:response:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Caches query results in a Django cache backend. Each entry records the
+    write generations of the models it depends on, so any post_save,
+    post_delete or m2m_changed on those models turns it into a miss.
+    """
+
+    def __init__(self, alias="default", timeout=60):
+        self.alias = alias
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    @classmethod
+    def from_settings(cls):
+        config = get_config()
+        if not config:
+            return None
+        return cls(config.get("ALIAS", "default"), config.get("TIMEOUT", 60))
+
+    def versions(self, models):
+        # Counters from this cache, so writes in other processes sharing it count.
+        return generations(models, self.alias)
+
+    async def aversions(self, models):
+        return await agenerations(models, self.alias)
+
+    def get(self, key, versions):
+        entry = self.cache.get(key)
+        if entry is None or entry["versions"] != versions:
+            return None
+        return entry["data"]
+
+    def set(self, key, versions, data):
+        self.cache.set(key, {"versions": versions, "data": data}, self.timeout)
+
+    async def aget(self, key, versions):
+        entry = await self.cache.aget(key)
+        if entry is None or entry["versions"] != versions:
+            return None
+        return entry["data"]
+
+    async def aset(self, key, versions, data):
+        await self.cache.aset(key, {"versions": versions, "data": data}, self.timeout)
@@ -1,16 +1,79 @@
 import graphene
-from graphene_django.filter import DjangoFilterConnectionField
 from graphene_django import DjangoObjectType
+from graphene_django.utils import bypass_get_queryset
 
+from crm.counting import count_queryset
+from crm.fields import KeysetConnectionField
 from crm.filters import CustomerFilter, OrderFilter, ProductFilter
-from .models import Customer, Product, Order
-from django.db import transaction
+from .bulk import (
+    PHONE_RE,
+    bulk_create_customers,
+    bulk_create_orders,
+    bulk_create_products,
+    upsert_customers,
+)
+from .loaders import load_related
+from .optimizer import optimize
+from .signals import bump_generation
+from .models import Customer, Product, Order, OrderItem
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
-import re
 from decimal import Decimal
 
 
+class CountableConnection(graphene.relay.Connection):
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+    total_count_is_exact = graphene.Boolean()
+
+    def get_count(self):
+        if not hasattr(self, "_count"):
+            strategy = getattr(self, "count_strategy", None)
+            if strategy is None:
+                # Plain graphene-django connections already counted while slicing.
+                length = getattr(self, "length", None)
+                self._count = (len(self.iterable) if length is None else length, True)
+            else:
+                self._count = count_queryset(self.iterable, self.count_args, strategy, self.count_cap)
+        return self._count
+
+    def resolve_total_count(self, info):
+        return self.get_count()[0]
+
+    def resolve_total_count_is_exact(self, info):
+        return self.get_count()[1]
+
+
+class OrderRelationsMixin:
+    # Batched through the request loaders instead of one query per order.
+    # bypass_get_queryset stops graphene-django from calling get_node per row.
+    @bypass_get_queryset
+    def resolve_customer(self, info):
+        return load_related(info, self, "customer")
+
+    def resolve_products(self, info, **kwargs):
+        return load_related(info, self, "products")
+
+    def resolve_items(self, info, **kwargs):
+        return load_related(info, self, "items")
+
+
+class OptimizedQuerysetMixin:
+    # Connection fields pass their queryset through here before filtering.
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        return optimize(queryset, info)
+
+
+class ReverseOrdersMixin:
+    def resolve_orders(self, info, **kwargs):
+        return load_related(info, self, "orders")
+
+
 class CustomerType(DjangoObjectType):
     class Meta:
         model = Customer
@@ -25,30 +88,44 @@ class ProductType(DjangoObjectType):
         fields = ("id", "name", "price", "stock")
 
 
-class OrderType(DjangoObjectType):
+class OrderItemType(DjangoObjectType):
+    class Meta:
+        model = OrderItem
+        fields = ("product", "quantity", "unit_price")
+
+    # Items come with their product already joined (select_related/prefetch).
+    @bypass_get_queryset
+    def resolve_product(self, info):
+        return self.product
+
+
+class OrderType(OrderRelationsMixin, DjangoObjectType):
     class Meta:
         model = Order
         interfaces = (graphene.relay.Node,)
-        fields = ("id", "customer", "products", "total_amount", "order_date")
+        fields = ("id", "customer", "products", "items", "total_amount", "order_date")
 
 # Relay Nodes (for pagination)
-class CustomerNode(DjangoObjectType):
+class CustomerNode(ReverseOrdersMixin, OptimizedQuerysetMixin, DjangoObjectType):
     class Meta:
         model = Customer
         interfaces = (graphene.relay.Node,)
-        fields = "__all__"
+        exclude = ("phone_digits",)
+        connection_class = CountableConnection
 
-class ProductNode(DjangoObjectType):
+class ProductNode(ReverseOrdersMixin, OptimizedQuerysetMixin, DjangoObjectType):
     class Meta:
         model = Product
         interfaces = (graphene.relay.Node,)
         fields = "__all__"
+        connection_class = CountableConnection
 
-class OrderNode(DjangoObjectType):
+class OrderNode(OrderRelationsMixin, OptimizedQuerysetMixin, DjangoObjectType):
     class Meta:
         model = Order
         interfaces = (graphene.relay.Node,)
         fields = "__all__"
+        connection_class = CountableConnection
 
 
 class CreateCustomer(graphene.Mutation):
@@ -72,7 +149,7 @@ class CreateCustomer(graphene.Mutation):
             raise Exception("Email already exists")
 
         # Validate phone (simple regex)
-        if phone and not re.match(r'^\+?\d[\d\-\s]{7,}$', phone):
+        if phone and not PHONE_RE.match(phone):
             raise Exception("Invalid phone number format")
 
         customer = Customer.objects.create(name=name, email=email, phone=phone)
@@ -80,35 +157,51 @@ class CreateCustomer(graphene.Mutation):
         return CreateCustomer(customer=customer, message="Customer created successfully!")
 
 
+class BulkRowError(graphene.ObjectType):
+    index = graphene.Int(description="Position of the rejected row in the input list")
+    message = graphene.String()
+
+
+class CustomerInput(graphene.InputObjectType):
+    name = graphene.String(required=True)
+    email = graphene.String(required=True)
+    phone = graphene.String(required=False)
+
+
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
-        input = graphene.List(graphene.JSONString, required=True)
+        input = graphene.List(graphene.NonNull(CustomerInput), required=True)
 
     customers = graphene.List(CustomerType)
     errors = graphene.List(graphene.String)
+    row_errors = graphene.List(BulkRowError)
 
     def mutate(self, info, input):
-        created = []
-        errors = []
-        with transaction.atomic():
-            for data in input:
-                try:
-                    name = data.get("name")
-                    email = data.get("email")
-                    phone = data.get("phone")
-
-                    if not name or not email:
-                        raise ValueError("Name and email are required")
-                    validate_email(email)
-                    if Customer.objects.filter(email=email).exists():
-                        raise ValueError(f"Duplicate email: {email}")
-                    if phone and not re.match(r'^\+?\d[\d\-\s]{7,}$', phone):
-                        raise ValueError(f"Invalid phone number: {phone}")
-
-                    created.append(Customer.objects.create(name=name, email=email, phone=phone))
-                except Exception as e:
-                    errors.append(str(e))
-        return BulkCreateCustomers(customers=created, errors=errors)
+        created, errors = bulk_create_customers(input)
+        return BulkCreateCustomers(
+            customers=created,
+            errors=[message for _, message in errors],
+            row_errors=[BulkRowError(index=index, message=message) for index, message in errors],
+        )
+
+
+class UpsertCustomers(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(graphene.NonNull(CustomerInput), required=True)
+
+    customers = graphene.List(CustomerType)
+    inserted = graphene.Int()
+    updated = graphene.Int()
+    row_errors = graphene.List(BulkRowError)
+
+    def mutate(self, info, input):
+        customers, inserted, updated, errors = upsert_customers(input)
+        return UpsertCustomers(
+            customers=customers,
+            inserted=inserted,
+            updated=updated,
+            row_errors=[BulkRowError(index=index, message=message) for index, message in errors],
+        )
 
 
 class CreateProduct(graphene.Mutation):
@@ -128,36 +221,142 @@ class CreateProduct(graphene.Mutation):
         product = Product.objects.create(name=name, price=Decimal(price), stock=stock)
         return CreateProduct(product=product)
 
+class ProductInput(graphene.InputObjectType):
+    name = graphene.String(required=True)
+    price = graphene.Float(required=True)
+    stock = graphene.Int(required=False)
+
+
+class BulkCreateProducts(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(graphene.NonNull(ProductInput), required=True)
+
+    products = graphene.List(ProductType)
+    row_errors = graphene.List(BulkRowError)
+
+    def mutate(self, info, input):
+        created, errors = bulk_create_products(input)
+        return BulkCreateProducts(
+            products=created,
+            row_errors=[BulkRowError(index=index, message=message) for index, message in errors],
+        )
+
+
+class StockConflict(Exception):
+    """A conditional stock decrement matched fewer rows than expected."""
+
+
+def stock_errors(products, wanted):
+    errors = []
+    for pk, quantity in wanted.items():
+        product = products.get(pk)
+        if product is None:
+            errors.append(f"Product {pk} does not exist")
+        elif product.stock < quantity:
+            errors.append(
+                f"Insufficient stock for product {pk} ({product.name}): "
+                f"requested {quantity}, available {product.stock}"
+            )
+    return errors
+
+
 class CreateOrder(graphene.Mutation):
     class Arguments:
         customer_id = graphene.ID(required=True)
         product_ids = graphene.List(graphene.ID, required=True)
+        # quantities[i] applies to product_ids[i]; each defaults to 1
+        quantities = graphene.List(graphene.Int, required=False)
 
     order = graphene.Field(OrderType)
+    errors = graphene.List(graphene.String)
 
-    def mutate(self, info, customer_id, product_ids):
+    def mutate(self, info, customer_id, product_ids, quantities=None):
         if not product_ids:
             raise Exception("At least one product must be provided")
+        if quantities is None:
+            quantities = [1] * len(product_ids)
+        if len(quantities) != len(product_ids):
+            raise Exception("quantities must have one entry per product ID")
+        if any(quantity is None or quantity < 1 for quantity in quantities):
+            raise Exception("Quantities must be positive")
+
+        # A product listed twice becomes one line with the quantities added up.
+        wanted = {}
+        for product_id, quantity in zip(product_ids, quantities):
+            try:
+                pk = int(product_id)
+            except (TypeError, ValueError):
+                raise Exception(f"Invalid product ID: {product_id}")
+            wanted[pk] = wanted.get(pk, 0) + quantity
 
         try:
             customer = Customer.objects.get(id=customer_id)
-        except Customer.DoesNotExist:
+        except (Customer.DoesNotExist, ValueError):
             raise Exception("Invalid customer ID")
 
-        products = Product.objects.filter(id__in=product_ids)
-        if not products.exists():
-            raise Exception("Invalid product IDs")
+        products = Product.objects.in_bulk(wanted)
+        errors = stock_errors(products, wanted)
+        if errors:
+            return CreateOrder(order=None, errors=errors)
+
+        # Reserve stock with one conditional UPDATE: every row must still
+        # hold enough, or the whole order rolls back.
+        needed = Case(
+            *(When(pk=pk, then=Value(quantity)) for pk, quantity in wanted.items()),
+            output_field=models.PositiveIntegerField(),
+        )
+        try:
+            with transaction.atomic():
+                reserved = Product.objects.filter(pk__in=wanted, stock__gte=needed).update(
+                    stock=F("stock") - needed
+                )
+                if reserved != len(wanted):
+                    raise StockConflict
+                order = Order.objects.create(customer=customer)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, product=products[pk], quantity=quantity,
+                              unit_price=products[pk].price)
+                    for pk, quantity in wanted.items()
+                ])
+                order.calculate_total()
+        except StockConflict:
+            # Another order took the stock after it was read; report what is left now.
+            errors = stock_errors(Product.objects.in_bulk(wanted), wanted)
+            return CreateOrder(order=None, errors=errors or ["Stock changed during checkout, please retry"])
+
+        # update() and bulk_create() send no signals.
+        bump_generation(Product)
+        bump_generation(OrderItem)
+        return CreateOrder(order=order, errors=[])
+
+class OrderInput(graphene.InputObjectType):
+    customer_id = graphene.ID(required=True)
+    product_ids = graphene.List(graphene.NonNull(graphene.ID), required=True)
+    quantities = graphene.List(graphene.NonNull(graphene.Int), required=False)
+
+
+class BulkCreateOrders(graphene.Mutation):
+    class Arguments:
+        input = graphene.List(graphene.NonNull(OrderInput), required=True)
+
+    orders = graphene.List(OrderType)
+    row_errors = graphene.List(BulkRowError)
 
-        order = Order.objects.create(customer=customer)
-        order.products.set(products)
-        order.calculate_total()
-        return CreateOrder(order=order)
+    def mutate(self, info, input):
+        created, errors = bulk_create_orders(input)
+        return BulkCreateOrders(
+            orders=created,
+            row_errors=[BulkRowError(index=index, message=message) for index, message in errors],
+        )
 
 class Mutation(graphene.ObjectType):
     create_customer = CreateCustomer.Field()
     bulk_create_customers = BulkCreateCustomers.Field()
+    upsert_customers = UpsertCustomers.Field()
     create_product = CreateProduct.Field()
+    bulk_create_products = BulkCreateProducts.Field()
     create_order = CreateOrder.Field()
+    bulk_create_orders = BulkCreateOrders.Field()
 
 
 
@@ -166,18 +365,22 @@ class Query(graphene.ObjectType):
     customers = graphene.List(CustomerType)
     products = graphene.List(ProductType)
     orders = graphene.List(OrderType)
-    all_customers = DjangoFilterConnectionField(CustomerNode, filterset_class=CustomerFilter)
-    all_products = DjangoFilterConnectionField(ProductNode, filterset_class=ProductFilter)
-    all_orders = DjangoFilterConnectionField(OrderNode, filterset_class=OrderFilter)
+    all_customers = KeysetConnectionField(CustomerNode, filterset_class=CustomerFilter, sort_key="created_at")
+    all_products = KeysetConnectionField(ProductNode, filterset_class=ProductFilter)
+    # Order filters reach through customers and products, which makes their
+    # counts the slow ones; see CRM_COUNT_CACHE_ALIAS.
+    all_orders = KeysetConnectionField(
+        OrderNode, filterset_class=OrderFilter, sort_key="order_date", count_strategy="cached"
+    )
 
     def resolve_customers(self,info):
-        return Customer.objects.prefetch_related('orders').all()
+        return optimize(Customer.objects.all(), info)
     
     def resolve_products(self,info):
-        return Product.objects.prefetch_related('orders').all()
+        return optimize(Product.objects.all(), info)
     
     def resolve_orders(self,info):
-        return Order.objects.select_related('customer').prefetch_related('products').all()
+        return optimize(Order.objects.all(), info)
     
 
 
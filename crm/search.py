@@ -0,0 +1,54 @@
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import Customer, Product
+
+# FTS5 shadow tables created by migration 0002, one per searchable model.
+FTS_TABLES = {
+    Customer: "crm_customer_fts",
+    Product: "crm_product_fts",
+}
+
+# The trigram tokenizer cannot match terms shorter than one trigram.
+MIN_TERM_LENGTH = 3
+
+_available = {}
+
+
+def fts_available(model, using="default"):
+    """True if the FTS5 table for `model` exists on the `using` database."""
+    table = FTS_TABLES.get(model)
+    if table is None:
+        return False
+    connection = connections[using]
+    key = (using, connection.settings_dict["NAME"], table)
+    if key not in _available:
+        found = False
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table]
+                )
+                found = cursor.fetchone() is not None
+        _available[key] = found
+    return _available[key]
+
+
+def fts_phrase(column, value):
+    # Quote the term as one phrase so FTS5 operators in user input stay literal.
+    return '{%s}: "%s"' % (column, value.replace('"', '""'))
+
+
+def search_contains(queryset, field_name, value):
+    """
+    Case-insensitive substring filter on `field_name`, answered from the
+    trigram index when there is one and by `icontains` otherwise.
+    """
+    model = queryset.model
+    if len(value) < MIN_TERM_LENGTH or not fts_available(model, queryset.db):
+        return queryset.filter(**{f"{field_name}__icontains": value})
+    table = FTS_TABLES[model]
+    matches = RawSQL(
+        f"SELECT rowid FROM {table} WHERE {table} MATCH %s", (fts_phrase(field_name, value),)
+    )
+    return queryset.filter(pk__in=matches)
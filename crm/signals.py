@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Customer, Order, OrderItem, Product
+
+GENERATION_KEY = "crm:generation:{}"
+
+# Data read through a model can change when any of these tables are written,
+# because the filtersets and relation fields join through them.
+DEPENDENCIES = {
+    Customer: (Customer,),
+    Product: (Product,),
+    Order: (Order, Customer, Product, OrderItem),
+}
+
+
+def generation_aliases():
+    """
+    Cache aliases holding generation counters. Counters live next to the
+    entries keyed on them, so a shared cache sees every process's writes.
+    """
+    aliases = {getattr(settings, "CRM_COUNT_CACHE_ALIAS", DEFAULT_CACHE_ALIAS)}
+    response_cache = getattr(settings, "CRM_RESPONSE_CACHE", None)
+    if response_cache:
+        aliases.add(response_cache.get("ALIAS", DEFAULT_CACHE_ALIAS))
+    return aliases
+
+
+def model_generation(model, using=DEFAULT_CACHE_ALIAS):
+    """Counter bumped on every write to `model`; embed it in cache keys to invalidate them."""
+    return caches[using].get_or_set(GENERATION_KEY.format(model._meta.label_lower), 0, timeout=None)
+
+
+def generations(models, using=DEFAULT_CACHE_ALIAS):
+    return [model_generation(m, using) for m in models]
+
+
+async def agenerations(models, using=DEFAULT_CACHE_ALIAS):
+    return [
+        await caches[using].aget_or_set(GENERATION_KEY.format(m._meta.label_lower), 0, timeout=None)
+        for m in models
+    ]
+
+
+def bump_generation(model):
+    key = GENERATION_KEY.format(model._meta.label_lower)
+    for alias in generation_aliases():
+        cache = caches[alias]
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderItem)
+def model_written(sender, **kwargs):
+    bump_generation(sender)
+
+
+@receiver(m2m_changed, sender=OrderItem)
+def order_products_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump_generation(sender)
@@ -1,3 +1,453 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from graphql_relay.utils import base64
+
+from .bulk import bulk_create_customers, upsert_customers
+from .filters import CustomerFilter, OrderFilter, ProductFilter
+from .management.commands.import_crm import IMPORTERS
+from .models import Customer, ImportCheckpoint, Order, OrderItem, Product
+
+
+@skipUnlessDBFeature("supports_explaining_query_execution")
+class FilterIndexTests(TestCase):
+    """Every range/prefix filter should be answered from an index, not a table scan."""
+
+    cases = [
+        (CustomerFilter, {"created_at__gte": "2024-01-01"}, "crm_customer"),
+        (CustomerFilter, {"created_at__lte": "2024-01-01"}, "crm_customer"),
+        (CustomerFilter, {"phone_pattern": "+1"}, "crm_customer"),
+        (ProductFilter, {"price__gte": "10"}, "crm_product"),
+        (ProductFilter, {"price__lte": "10"}, "crm_product"),
+        (ProductFilter, {"stock__gte": "5"}, "crm_product"),
+        (ProductFilter, {"stock__lte": "5"}, "crm_product"),
+        (OrderFilter, {"total_amount__gte": "100"}, "crm_order"),
+        (OrderFilter, {"total_amount__lte": "100"}, "crm_order"),
+        (OrderFilter, {"order_date__gte": "2024-01-01"}, "crm_order"),
+        (OrderFilter, {"order_date__lte": "2024-01-01"}, "crm_order"),
+    ]
+
+    def assertUsesIndex(self, queryset, table):
+        plan = queryset.explain()
+        self.assertNotIn(f"SCAN {table}", plan)
+        self.assertRegex(plan, rf"SEARCH {table} USING (COVERING )?INDEX")
+
+    def test_filters_use_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plan assertions are written against SQLite's EXPLAIN QUERY PLAN")
+        for filterset_class, data, table in self.cases:
+            with self.subTest(filterset=filterset_class.__name__, data=data):
+                filterset = filterset_class(data)
+                self.assertTrue(filterset.is_valid(), filterset.errors)
+                self.assertUsesIndex(filterset.qs, table)
+
+    def test_keyset_order_uses_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plan assertions are written against SQLite's EXPLAIN QUERY PLAN")
+        qs = OrderFilter({"order_date__gte": "2024-01-01"}).qs.order_by("order_date", "id")
+        plan = qs.explain()
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+        self.assertUsesIndex(qs, "crm_order")
+
+
+
+class GraphQLTestCase(TestCase):
+    def execute(self, query, variables=None):
+        response = self.client.post(
+            "/graphql", json.dumps({"query": query, "variables": variables or {}}),
+            content_type="application/json",
+        )
+        return response.json()
+
+
+class CreateOrderTests(GraphQLTestCase):
+    mutation = """
+        mutation($customer: ID!, $products: [ID]!, $quantities: [Int]) {
+            createOrder(customerId: $customer, productIds: $products, quantities: $quantities) {
+                order { totalAmount items { quantity unitPrice } }
+                errors
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Ann", email="ann@example.com")
+        cls.pen = Product.objects.create(name="Pen", price="1.50", stock=5)
+        cls.ink = Product.objects.create(name="Ink", price="4.00", stock=2)
+
+    def create_order(self, products, quantities=None):
+        result = self.execute(self.mutation, {
+            "customer": self.customer.pk,
+            "products": [product.pk for product in products],
+            "quantities": quantities,
+        })
+        self.assertNotIn("errors", result)
+        return result["data"]["createOrder"]
+
+    def assertStock(self, pen, ink):
+        self.assertEqual(
+            dict(Product.objects.values_list("name", "stock")), {"Pen": pen, "Ink": ink}
+        )
+
+    def test_reserves_stock(self):
+        # The same product twice is one line with the quantities added up.
+        result = self.create_order([self.pen, self.ink, self.pen], [2, 2, 1])
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(Decimal(str(result["order"]["totalAmount"])), Decimal("12.50"))
+        self.assertEqual(
+            sorted(item["quantity"] for item in result["order"]["items"]), [2, 3]
+        )
+        self.assertStock(pen=2, ink=0)
+
+    def test_insufficient_stock(self):
+        result = self.create_order([self.pen, self.ink], [1, 3])
+        self.assertIsNone(result["order"])
+        self.assertEqual(
+            result["errors"],
+            [f"Insufficient stock for product {self.ink.pk} (Ink): requested 3, available 2"],
+        )
+        self.assertFalse(Order.objects.exists())
+        self.assertStock(pen=5, ink=2)
+
+    def test_rolls_back_when_stock_changes_after_read(self):
+        in_bulk = Product.objects.in_bulk
+
+        def read_then_sell_out(*args, **kwargs):
+            products = in_bulk(*args, **kwargs)
+            # A concurrent order takes the last ink between the read and the UPDATE.
+            Product.objects.filter(pk=self.ink.pk).update(stock=0)
+            return products
+
+        with mock.patch.object(Product.objects, "in_bulk", side_effect=read_then_sell_out):
+            result = self.create_order([self.pen, self.ink], [1, 1])
+        self.assertIsNone(result["order"])
+        self.assertEqual(
+            result["errors"],
+            [f"Insufficient stock for product {self.ink.pk} (Ink): requested 1, available 0"],
+        )
+        # The pen's decrement went with the rolled-back transaction.
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertStock(pen=5, ink=0)
+
+
+class KeysetPaginationTests(GraphQLTestCase):
+    query = """
+        query($first: Int, $last: Int, $after: String, $before: String, $offset: Int) {
+            allCustomers(first: $first, last: $last, after: $after, before: $before, offset: $offset) {
+                edges { cursor node { name } }
+                pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Customer.objects.bulk_create(
+            Customer(name=f"C{i}", email=f"c{i}@example.com") for i in range(5)
+        )
+        # Equal sort keys: pages must still split on the id tiebreaker.
+        Customer.objects.filter(name__in=["C1", "C2", "C3"]).update(
+            created_at=Customer.objects.get(name="C1").created_at
+        )
+
+    def page(self, **variables):
+        result = self.execute(self.query, variables)
+        self.assertNotIn("errors", result)
+        connection = result["data"]["allCustomers"]
+        return [edge["node"]["name"] for edge in connection["edges"]], connection["pageInfo"]
+
+    def test_forward(self):
+        names, after, pages = [], None, []
+        while True:
+            page, info = self.page(first=2, after=after)
+            names += page
+            pages.append(info["hasNextPage"])
+            if not info["hasNextPage"]:
+                break
+            after = info["endCursor"]
+        self.assertEqual(names, ["C0", "C1", "C2", "C3", "C4"])
+        self.assertEqual(pages, [True, True, False])
+
+    def test_backward(self):
+        names, info = self.page(last=2)
+        self.assertEqual(names, ["C3", "C4"])
+        self.assertTrue(info["hasPreviousPage"])
+        names, info = self.page(last=2, before=info["startCursor"])
+        self.assertEqual(names, ["C1", "C2"])
+        names, info = self.page(last=2, before=info["startCursor"])
+        self.assertEqual(names, ["C0"])
+        self.assertFalse(info["hasPreviousPage"])
+
+    def test_between_cursors(self):
+        _, first_page = self.page(first=1)
+        _, last_page = self.page(last=1)
+        names, _ = self.page(first=10, after=first_page["endCursor"], before=last_page["startCursor"])
+        self.assertEqual(names, ["C1", "C2", "C3"])
+
+    def test_legacy_offset_paging(self):
+        self.assertEqual(self.page(first=2, offset=1)[0], ["C1", "C2"])
+        # Cursors handed out by the offset-based field before keyset paging.
+        self.assertEqual(self.page(first=2, after=base64("arrayconnection:2"))[0], ["C3", "C4"])
+
+    def test_invalid_cursor(self):
+        for cursor in [base64("keyset:not json"), base64('keyset:["x", 1]'), base64("keyset:[1]")]:
+            with self.subTest(cursor=cursor):
+                result = self.execute(self.query, {"first": 2, "after": cursor})
+                self.assertEqual(result["errors"][0]["message"], f"Invalid cursor: {cursor}")
+
+
+
+class QueryCostTests(GraphQLTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cost_check_stays_off_the_database(self):
+        Customer.objects.create(name="Ann", email="ann@example.com")
+        self.execute("{ customers { name } }")
+        # Only the customers themselves; the table size for the cost is cached.
+        with self.assertNumQueries(1):
+            result = self.execute("{ customers { name } }")
+        self.assertEqual(result["data"], {"customers": [{"name": "Ann"}]})
+
+    def test_nested_lists_are_sized_by_fan_out(self):
+        customers = Customer.objects.bulk_create(
+            Customer(name=f"C{i}", email=f"c{i}@example.com") for i in range(20)
+        )
+        products = Product.objects.bulk_create(
+            Product(name=f"P{i}", price="1.00", stock=10) for i in range(50)
+        )
+        orders = Order.objects.bulk_create(
+            Order(customer=customers[i % 20], total_amount=3) for i in range(300)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=products[(i + k) % 50], unit_price="1.00")
+            for i, order in enumerate(orders)
+            for k in range(3)
+        )
+        queries = [
+            "{ orders { id products { edges { node { name } } } } }",
+            "{ orders { id items { quantity product { name } } } }",
+            """{ allCustomers(first: 3) { edges { node { name
+                orders { edges { node { products { edges { node { name } } } } } }
+            } } } }""",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                result = self.execute(query)
+                self.assertNotIn("errors", result)
+                cost = result["extensions"]["cost"]
+                # 300 orders x 3 products each, not x the 100-row page limit.
+                self.assertLessEqual(cost["requested"], 300 * (1 + 1 + 3 * 2))
+                self.assertLess(cost["requested"], cost["budget"])
+
+
+class SharedCacheTestCase(GraphQLTestCase):
+    """Runs with a per-process "default" cache and a "shared" file cache."""
+
+    shared_settings = {}
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.caches = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": f"{type(self).__name__}-default"},
+            "shared": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                       "LOCATION": directory},
+        }
+        overrides = self.settings(CACHES=self.caches, **self.shared_settings)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def other_process(self):
+        """Settings for another worker: same shared cache, its own default one."""
+        return self.settings(CACHES={
+            **self.caches,
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": f"{type(self).__name__}-other"},
+        })
+
+
+class ResponseCacheTests(SharedCacheTestCase):
+    query = "{ products { name stock } }"
+    shared_settings = {"CRM_RESPONSE_CACHE": {"ALIAS": "shared", "TIMEOUT": 60}}
+
+    def test_write_from_another_process_invalidates(self):
+        pen = Product.objects.create(name="Pen", price="1.00", stock=5)
+        self.assertEqual(self.execute(self.query)["extensions"]["responseCache"], "MISS")
+        self.assertEqual(self.execute(self.query)["extensions"]["responseCache"], "HIT")
+
+        with self.other_process():
+            pen.stock = 4
+            pen.save()
+
+        result = self.execute(self.query)
+        self.assertEqual(result["extensions"]["responseCache"], "MISS")
+        self.assertEqual(result["data"]["products"], [{"name": "Pen", "stock": 4}])
+
+
+class TotalCountTests(SharedCacheTestCase):
+    shared_settings = {"CRM_COUNT_CACHE_ALIAS": "shared"}
+
+    def total_count(self, field):
+        result = self.execute(f"{{ {field}(first: 1) {{ totalCount totalCountIsExact }} }}")
+        self.assertNotIn("errors", result)
+        return result["data"][field]["totalCount"]
+
+    def test_counts_follow_writes(self):
+        ann = Customer.objects.create(name="Ann", email="ann@example.com")
+        Order.objects.create(customer=ann)
+        self.assertEqual(self.total_count("allOrders"), 1)
+        self.assertEqual(self.total_count("allCustomers"), 1)
+
+        Order.objects.create(customer=ann)
+        self.assertEqual(self.total_count("allOrders"), 2)
+
+        # Cached counts stay exact across workers through the shared alias.
+        with self.other_process():
+            Order.objects.create(customer=ann)
+            Customer.objects.create(name="Bob", email="bob@example.com")
+        self.assertEqual(self.total_count("allOrders"), 3)
+        self.assertEqual(self.total_count("allCustomers"), 2)
+
+
+class UpsertCustomersTests(TestCase):
+    def test_inserted_updated_split(self):
+        ann = Customer.objects.create(name="Ann", email="ann@example.com", phone="+1 555-000-0001")
+        rows = [
+            {"name": "Bob", "email": "bob@example.com"},
+            {"name": "Ann Lee", "email": "ann@example.com"},
+            {"name": "Cy", "email": "not-an-email"},
+            {"name": "Di", "email": "di@example.com"},
+            # A repeated email is one customer; the last row wins.
+            {"name": "Bobby", "email": "bob@example.com", "phone": "+1 555-000-0002"},
+        ]
+        customers, inserted, updated, errors = upsert_customers(rows, size=2)
+
+        self.assertEqual((inserted, updated), (2, 1))
+        self.assertEqual(errors, [(2, "Invalid email: not-an-email")])
+        self.assertEqual(
+            sorted((c.email, c.name) for c in customers),
+            [("ann@example.com", "Ann Lee"), ("bob@example.com", "Bobby"), ("di@example.com", "Di")],
+        )
+        self.assertEqual(Customer.objects.count(), 3)
+        stored = Customer.objects.get(email="ann@example.com")
+        self.assertEqual((stored.pk, stored.name, stored.phone), (ann.pk, "Ann Lee", None))
+        self.assertEqual(stored.created_at, ann.created_at)
+        self.assertEqual(
+            next(c for c in customers if c.email == "ann@example.com").created_at, ann.created_at
+        )
+        self.assertEqual(Customer.objects.get(email="bob@example.com").phone_digits, "15550000002")
+
+        # Replaying the same rows inserts nothing.
+        _, inserted, updated, _ = upsert_customers(rows, size=2)
+        self.assertEqual((inserted, updated), (0, 3))
+        self.assertEqual(Customer.objects.count(), 3)
+
+class ImportCommandTests(TestCase):
+    def write_file(self, lines, suffix=".ndjson"):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def import_file(self, resource, lines, *args, suffix=".ndjson"):
+        stderr = StringIO()
+        call_command("import_crm", resource, self.write_file(lines, suffix), *args,
+                     stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue().splitlines()
+
+    def test_mistyped_rows_are_rejected(self):
+        errors = self.import_file("customers", [
+            '{"name": "Ann", "email": "ann@example.com"}',
+            '{"name": "Bob", "email": 12345}',
+            '{"name": "Cy", "email": "cy@example.com", "phone": 5551234567}',
+            '{"name": ["Di"], "email": "di@example.com"}',
+            '{"name": "Ed", "email": "ed@example.com", "phone": "+1 555-123-4567"}',
+        ])
+        self.assertEqual(errors, [
+            "row 2: Email must be a string",
+            "row 3: Phone must be a string",
+            "row 4: Name must be a string",
+        ])
+        self.assertQuerySetEqual(
+            Customer.objects.order_by("email").values_list("email", flat=True),
+            ["ann@example.com", "ed@example.com"],
+        )
+
+        errors = self.import_file("products", [
+            '{"name": 7, "price": "1.00"}',
+            '{"name": "Pen", "price": "1.00", "stock": 3}',
+        ])
+        self.assertEqual(errors, ["row 1: Name must be a string"])
+        self.assertQuerySetEqual(Product.objects.values_list("name", flat=True), ["Pen"])
+
+    def test_errors_report_file_lines(self):
+        errors = self.import_file("customers", [
+            '{"name": "Ann", "email": "ann@example.com"}',
+            "",
+            "{not json",
+            "",
+            '{"name": "Bob", "email": "ann@example.com"}',
+        ])
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith("row 3: Invalid JSON"))
+        self.assertEqual(errors[1], "row 5: Duplicate email: ann@example.com")
+
+        errors = self.import_file("products", [
+            "name,price,stock",
+            "Pen,1.00,3",
+            "Ink,-1,3",
+        ], suffix=".csv")
+        self.assertEqual(errors, ["row 3: Price must be positive"])
+
+    def test_resume_after_failed_chunk(self):
+        lines = [f'{{"name": "C{i}", "email": "c{i}@example.com"}}' for i in range(5)]
+        lines.insert(2, "")
+        path = self.write_file(lines)
+        calls = []
+
+        def fail_on_second_chunk(rows, size=None):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return bulk_create_customers(rows, size)
+
+        with mock.patch.dict(IMPORTERS, customers=fail_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                call_command("import_crm", "customers", path, "--chunk-size", "2",
+                             stdout=StringIO(), stderr=StringIO())
+        # The checkpoint moved with the committed chunk and no further.
+        self.assertEqual(ImportCheckpoint.objects.get(name=path).line, 2)
+        self.assertEqual(Customer.objects.count(), 2)
+
+        with self.assertRaises(CommandError):
+            call_command("import_crm", "products", path, "--checkpoint", path, "--resume",
+                         stdout=StringIO(), stderr=StringIO())
+
+        stderr = StringIO()
+        call_command("import_crm", "customers", path, "--chunk-size", "2", "--resume",
+                     stdout=StringIO(), stderr=stderr)
+        self.assertEqual(stderr.getvalue(), "")
+        self.assertEqual(Customer.objects.count(), 5)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_chunk_size_must_be_positive(self):
+        path = self.write_file(['{"name": "Ann", "email": "ann@example.com"}'])
+        for size in ("0", "-1"):
+            with self.subTest(size=size), self.assertRaisesMessage(CommandError, "must be positive"):
+                call_command("import_crm", "customers", path, "--chunk-size", size,
+                             stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Customer.objects.exists())
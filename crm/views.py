@@ -1,3 +1,521 @@
-from django.shortcuts import render
+import csv
+import time
+from collections import defaultdict
+from inspect import isawaitable
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.http.response import HttpResponseBadRequest
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphene_django.utils.utils import set_rollback
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, parse, validate_schema
+from graphql.error import GraphQLError
+from django.views.generic import View
+from graphql.validation import validate
+
+from .cost import estimate_cost
+from .encoders import get_encoder
+from .execution import ConcurrentExecutionContext
+from .filters import CustomerFilter, OrderFilter, ProductFilter
+from .incremental import execute_incremental
+from .loaders import BatchingExecutionContext
+from .lru import LRUCache
+from .models import Customer, Order, OrderItem, Product
+from .persisted_queries import PersistedQueryError, query_hash, resolve_persisted_query
+from .response_cache import ResponseCache, cache_key, operation_models
+
+# sha256 of the document -> (document AST or None, parse/validation errors)
+document_cache = LRUCache(getattr(settings, "CRM_DOCUMENT_CACHE_MAX_ENTRIES", 1000))
+
+
+class CRMGraphQLView(GraphQLView):
+    execution_context_class = BatchingExecutionContext
+    incremental_content_type = 'multipart/mixed; boundary="-"; deferSpec=20220824'
+    accepts_incremental = False
+    incremental_context = None
+
+    def dispatch(self, request, *args, **kwargs):
+        self.accepts_incremental = "multipart/mixed" in request.META.get("HTTP_ACCEPT", "")
+        self.incremental_context = None
+        response = super().dispatch(request, *args, **kwargs)
+        if self.incremental_context is None or response.status_code != 200:
+            return response
+        return self.incremental_response(request, response.content.decode())
+
+    def incremental_response(self, request, initial):
+        """Send the initial result, then each @defer/@stream payload as its own part."""
+        context = self.incremental_context
+
+        def parts():
+            yield self.multipart_part(initial)
+            for payload in context.subsequent_payloads():
+                yield self.multipart_part(self.json_encode(request, payload))
+            yield "\r\n-----\r\n"
+
+        return StreamingHttpResponse(parts(), content_type=self.incremental_content_type)
+
+    def json_encode(self, request, d, pretty=False):
+        if not (self.pretty or pretty) and not request.GET.get("pretty"):
+            return get_encoder()(d)
+        return super().json_encode(request, d, pretty)
+
+    @staticmethod
+    def multipart_part(body):
+        return "\r\n---\r\nContent-Type: application/json; charset=utf-8\r\n\r\n" + body
+
+    def parse_body(self, request):
+        # A JSON array is a batch of operations sharing this request (and so
+        # its loaders); a single object keeps the usual behaviour.
+        if self.get_content_type(request) == "application/json" and request.body.lstrip()[:1] == b"[":
+            self.batch = True
+            data = super().parse_body(request)
+            max_size = getattr(settings, "CRM_MAX_BATCH_SIZE", 20)
+            if len(data) > max_size:
+                raise HttpError(
+                    HttpResponseBadRequest(f"Batch of {len(data)} operations exceeds the limit of {max_size}.")
+                )
+            return data
+        return super().parse_body(request)
+
+    def get_response(self, request, data, show_graphiql=False):
+        started = time.perf_counter()
+        try:
+            data = self.with_persisted_query(request, data)
+        except PersistedQueryError as e:
+            return self.json_encode(request, {"errors": [self.format_error(e)]}), e.status_code
+
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        return self.encode_result(request, execution_result, id, started, show_graphiql)
+
+    @staticmethod
+    def with_persisted_query(request, data):
+        query, request.crm_query_hash = resolve_persisted_query(request, data)
+        if query and not data.get("query"):
+            data = dict(data.items(), query=query)
+        return data
+
+    def encode_result(self, request, execution_result, id, started, show_graphiql=False):
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [
+                    self.format_error(e) for e in execution_result.errors
+                ]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.incremental_context is not None:
+                response["hasNext"] = True
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+                timing = {"durationMs": round((time.perf_counter() - started) * 1000, 3)}
+                response["extensions"] = {**response.get("extensions", {}), "timing": timing}
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def get_document(self, request, query):
+        """Parse and validate `query`, reusing the result for documents seen before."""
+        key = (
+            getattr(request, "crm_query_hash", None) or query_hash(query),
+            id(self.schema),
+            tuple(self.validation_rules or ()),
+        )
+        cached = document_cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            document = parse(query)
+        except Exception as e:
+            cached = (None, [e])
+        else:
+            errors = validate(
+                self.schema.graphql_schema,
+                document,
+                self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+            cached = (document, errors)
+        document_cache.set(key, cached)
+        return cached
+
+    def execute_document(self, schema, document, operation_ast, execute_options):
+        if (
+            self.accepts_incremental
+            and not self.batch
+            and operation_ast is not None
+            and operation_ast.operation == OperationType.QUERY
+        ):
+            result, context = execute_incremental(schema, document, **execute_options)
+            if context is not None and context.pending:
+                self.incremental_context = context
+            return result
+        return execute(schema, document, **execute_options)
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+        operation = self.get_operation(request, query, operation_name)
+        if isinstance(operation, ExecutionResult):
+            return operation
+        document, operation_ast = operation
+
+        result, extensions = self.check_cost(document, operation_name, variables)
+        if result is not None:
+            return result
+
+        try:
+            self.check_method(request, operation_ast)
+        except HttpError:
+            if show_graphiql:
+                return None
+            raise
+
+        response_cache = None
+        if operation_ast is not None and operation_ast.operation == OperationType.QUERY:
+            response_cache = ResponseCache.from_settings()
+        if response_cache is not None:
+            key = cache_key(document, operation_name, variables)
+            # Read generations before executing so a concurrent write wins.
+            versions = response_cache.versions(operation_models(schema, document, operation_ast))
+            data = response_cache.get(key, versions)
+            if data is not None:
+                return ExecutionResult(data=data, extensions={**extensions, "responseCache": "HIT"})
+            extensions["responseCache"] = "MISS"
+
+        try:
+            execute_options = self.get_execute_options(request, variables, operation_name)
+            if self.is_atomic_mutation(operation_ast):
+                result = self.execute_mutation(request, schema, document, operation_ast, execute_options)
+            else:
+                result = self.execute_document(schema, document, operation_ast, execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e], extensions=extensions)
+        finally:
+            self.forget_loaders(request, operation_ast)
+
+        if response_cache is not None and not result.errors and self.incremental_context is None:
+            response_cache.set(key, versions, result.data)
+        result.extensions = {**(result.extensions or {}), **extensions}
+        return result
+
+    def get_operation(self, request, query, operation_name):
+        """(document, operation AST), or an ExecutionResult with the errors that stop it."""
+        schema_validation_errors = validate_schema(self.schema.graphql_schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, errors = self.get_document(request, query)
+        if document is None or errors:
+            return ExecutionResult(data=None, errors=errors)
+        return document, get_operation_ast(document, operation_name)
+
+    def check_cost(self, document, operation_name, variables):
+        """(ExecutionResult refusing the operation or None, cost extensions)."""
+        cost = estimate_cost(
+            self.schema.graphql_schema, document, operation_name, variables,
+            default_list_size=graphene_settings.RELAY_CONNECTION_MAX_LIMIT,
+            list_sizes=getattr(settings, "CRM_QUERY_LIST_SIZES", None),
+        )
+        budget = getattr(settings, "CRM_QUERY_COST_BUDGET", None)
+        extensions = {"cost": {"requested": cost, "budget": budget}}
+        if budget is not None and cost > budget:
+            error = GraphQLError(
+                f"Query cost {cost} exceeds the budget of {budget}.",
+                extensions={"code": "QUERY_TOO_EXPENSIVE"},
+            )
+            return ExecutionResult(data=None, errors=[error], extensions=extensions), extensions
+        return None, extensions
+
+    @staticmethod
+    def check_method(request, operation_ast):
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+    def get_execute_options(self, request, variables, operation_name):
+        return {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+            "execution_context_class": self.execution_context_class,
+        }
+
+    @staticmethod
+    def is_atomic_mutation(operation_ast):
+        return (
+            operation_ast is not None
+            and operation_ast.operation == OperationType.MUTATION
+            and (
+                graphene_settings.ATOMIC_MUTATIONS is True
+                or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+            )
+        )
+
+    def execute_mutation(self, request, schema, document, operation_ast, execute_options):
+        with transaction.atomic():
+            result = self.execute_document(schema, document, operation_ast, execute_options)
+            if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                transaction.set_rollback(True)
+        return result
+
+    @staticmethod
+    def forget_loaders(request, operation_ast):
+        if operation_ast is not None and operation_ast.operation == OperationType.MUTATION:
+            # Later operations in a batch must not see pre-mutation rows.
+            request.__dict__.pop("crm_loaders", None)
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    Async variant for ASGI deployments.
+
+    Body parsing, the persisted-query, document and response cache lookups
+    and query execution run on the event loop; each root field's resolvers
+    (sync ORM code) run in their own worker thread, concurrently (see
+    ConcurrentExecutionContext). Mutations and @defer/@stream requests keep
+    the serial sync path in a worker thread, mutations in their transaction.
+    """
+
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.accepts_incremental = "multipart/mixed" in request.META.get("HTTP_ACCEPT", "")
+        self.incremental_context = None
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = [await self.get_response_async(request, entry) for entry in data]
+                result = "[{}]".format(",".join([response[0] for response in responses]))
+                status_code = max([response[1] for response in responses], default=200)
+            else:
+                result, status_code = await self.get_response_async(request, data)
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+        if self.incremental_context is None or status_code != 200:
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+        return self.incremental_response(request, result)
+
+    async def get_response_async(self, request, data):
+        started = time.perf_counter()
+        try:
+            data = self.with_persisted_query(request, data)
+        except PersistedQueryError as e:
+            return self.json_encode(request, {"errors": [self.format_error(e)]}), e.status_code
+
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = await self.execute_graphql_request_async(
+            request, query, variables, operation_name
+        )
+        return self.encode_result(request, execution_result, id, started)
+
+    async def execute_graphql_request_async(self, request, query, variables, operation_name):
+        if not query:
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+        operation = self.get_operation(request, query, operation_name)
+        if isinstance(operation, ExecutionResult):
+            return operation
+        document, operation_ast = operation
+
+        # Unbounded lists are costed by table size, which can take a COUNT(*).
+        result, extensions = await sync_to_async(self.check_cost)(document, operation_name, variables)
+        if result is not None:
+            return result
+
+        self.check_method(request, operation_ast)
+
+        response_cache = None
+        if operation_ast is not None and operation_ast.operation == OperationType.QUERY:
+            response_cache = ResponseCache.from_settings()
+        if response_cache is not None:
+            key = cache_key(document, operation_name, variables)
+            # Read generations before executing so a concurrent write wins.
+            versions = await response_cache.aversions(operation_models(schema, document, operation_ast))
+            data = await response_cache.aget(key, versions)
+            if data is not None:
+                return ExecutionResult(data=data, extensions={**extensions, "responseCache": "HIT"})
+            extensions["responseCache"] = "MISS"
+
+        try:
+            execute_options = self.get_execute_options(request, variables, operation_name)
+            result = await self.execute_document_async(
+                request, schema, document, operation_ast, execute_options
+            )
+        except Exception as e:
+            return ExecutionResult(errors=[e], extensions=extensions)
+        finally:
+            self.forget_loaders(request, operation_ast)
+
+        if response_cache is not None and not result.errors and self.incremental_context is None:
+            await response_cache.aset(key, versions, result.data)
+        result.extensions = {**(result.extensions or {}), **extensions}
+        return result
+
+    async def execute_document_async(self, request, schema, document, operation_ast, execute_options):
+        if self.is_atomic_mutation(operation_ast):
+            return await sync_to_async(self.execute_mutation)(
+                request, schema, document, operation_ast, execute_options
+            )
+        if (
+            operation_ast is not None and operation_ast.operation != OperationType.QUERY
+        ) or self.accepts_incremental:
+            return await sync_to_async(self.execute_document)(
+                schema, document, operation_ast, execute_options
+            )
+        execute_options = dict(execute_options, execution_context_class=ConcurrentExecutionContext)
+        result = execute(schema, document, **execute_options)
+        if isawaitable(result):
+            result = await result
+        return result
+
+
+class _Echo:
+    """csv.writer target that hands each row straight back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+class ExportView(View):
+    """
+    Stream every row matching the resource's filterset as NDJSON or CSV.
+
+    GET /export/<customers|products|orders>?format=csv&<filter args>
+    Rows are read with iterator(chunk_size=...) so memory stays flat, and
+    order product ids are fetched with one query per chunk.
+    """
+
+    resources = {
+        "customers": (Customer, CustomerFilter, ("id", "name", "email", "phone", "created_at")),
+        "products": (Product, ProductFilter, ("id", "name", "price", "stock")),
+        "orders": (Order, OrderFilter, ("id", "customer_id", "total_amount", "order_date")),
+    }
+
+    def get(self, request, resource):
+        if resource not in self.resources:
+            raise Http404(f"Unknown export resource: {resource}")
+        model, filterset_class, columns = self.resources[resource]
+        export_format = request.GET.get("format", "ndjson")
+        if export_format not in ("ndjson", "csv"):
+            return HttpResponseBadRequest("format must be ndjson or csv")
+
+        data = request.GET.copy()
+        data.pop("format", None)
+        filterset = filterset_class(data, queryset=model.objects.order_by("pk"), request=request)
+        if not filterset.is_valid():
+            return HttpResponseBadRequest(filterset.form.errors.as_json(), content_type="application/json")
+
+        rows = self.iter_rows(filterset.qs, columns, with_products=model is Order)
+        if model is Order:
+            columns = columns + ("product_ids",)
+        if export_format == "csv":
+            content, content_type = self.iter_csv(columns, rows), "text/csv"
+        else:
+            content, content_type = self.iter_ndjson(columns, rows), "application/x-ndjson"
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{resource}.{export_format}"'
+        return response
+
+    def iter_rows(self, queryset, columns, with_products=False):
+        chunk_size = getattr(settings, "CRM_EXPORT_CHUNK_SIZE", 2000)
+        chunk = []
+        for row in queryset.values_list(*columns).iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from self.finish_chunk(chunk, with_products)
+                chunk = []
+        if chunk:
+            yield from self.finish_chunk(chunk, with_products)
+
+    @staticmethod
+    def finish_chunk(chunk, with_products):
+        if not with_products:
+            return chunk
+        product_ids = defaultdict(list)
+        links = OrderItem.objects.filter(order_id__in=[row[0] for row in chunk])
+        for order_id, product_id in links.order_by("order_id", "product_id").values_list("order_id", "product_id"):
+            product_ids[order_id].append(product_id)
+        return [row + (product_ids[row[0]],) for row in chunk]
+
+    @staticmethod
+    def iter_ndjson(columns, rows):
+        encode = get_encoder()
+        for row in rows:
+            yield encode(dict(zip(columns, row))) + "\n"
+
+    @staticmethod
+    def iter_csv(columns, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            values = [
+                " ".join(map(str, value)) if isinstance(value, list)
+                else value.isoformat() if hasattr(value, "isoformat")
+                else "" if value is None else value
+                for value in row
+            ]
+            yield writer.writerow(values)